@@ -0,0 +1,26 @@
+"""Add (author_id, id) index to posts
+
+Revision ID: 3f1d2b7c9a41
+Revises: 100c6f2af670
+Create Date: 2026-10-18 09:12:40.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1d2b7c9a41'
+down_revision: Union[str, None] = '100c6f2af670'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_Innlegg_author_id_id', 'Innlegg', ['author_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_Innlegg_author_id_id', table_name='Innlegg')
@@ -0,0 +1,35 @@
+"""Add allowed tenants table
+
+Revision ID: 4a7c2e9b1f53
+Revises: d91a6e3f0c27
+Create Date: 2026-10-18 13:02:47.214583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7c2e9b1f53'
+down_revision: Union[str, None] = 'd91a6e3f0c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    tenants = op.create_table('Leietakere',
+    sa.Column('tenant_id', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('issuer', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.PrimaryKeyConstraint('tenant_id')
+    )
+    # The example tenant previously hard coded in the application
+    op.bulk_insert(tenants, [
+        {'tenant_id': 'intility_tenant_id', 'issuer': 'https://login.microsoftonline.com/intility_tenant/v2.0'},
+    ])
+
+
+def downgrade() -> None:
+    op.drop_table('Leietakere')
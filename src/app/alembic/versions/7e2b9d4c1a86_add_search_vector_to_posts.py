@@ -0,0 +1,39 @@
+"""Add full-text search vector and GIN index to posts
+
+Revision ID: 7e2b9d4c1a86
+Revises: 4a7c2e9b1f53
+Create Date: 2026-10-18 14:37:52.908114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2b9d4c1a86'
+down_revision: Union[str, None] = '4a7c2e9b1f53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Kept in sync with POSTGRES_SEARCH_DDL in src/app/schemas/models.py. Adding a
+    # stored generated column rewrites the table once.
+    op.execute(
+        'ALTER TABLE "Innlegg" ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ('
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+        ") STORED"
+    )
+    # Build the index without blocking writes, which can't run in a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY "ix_Innlegg_search_vector" '
+            'ON "Innlegg" USING gin (search_vector)'
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_Innlegg_search_vector', table_name='Innlegg')
+    op.drop_column('Innlegg', 'search_vector')
@@ -0,0 +1,38 @@
+"""Add per-author post counters table
+
+Revision ID: b5e0c4a7d2f8
+Revises: 3f1d2b7c9a41
+Create Date: 2026-10-18 10:02:11.532947
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e0c4a7d2f8'
+down_revision: Union[str, None] = '3f1d2b7c9a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('Brukerstatistikk',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_count', sa.Integer(), nullable=False),
+    sa.Column('published_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['Brukere.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Backfill the counters for existing authors
+    op.execute(
+        'INSERT INTO "Brukerstatistikk" (user_id, post_count, published_count) '
+        'SELECT u.id, COUNT(p.id), COALESCE(SUM(CASE WHEN p.published THEN 1 ELSE 0 END), 0) '
+        'FROM "Brukere" u LEFT JOIN "Innlegg" p ON p.author_id = u.id GROUP BY u.id'
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('Brukerstatistikk')
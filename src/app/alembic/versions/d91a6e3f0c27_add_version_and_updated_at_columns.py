@@ -0,0 +1,30 @@
+"""Add version and updated_at columns to users and posts
+
+Revision ID: d91a6e3f0c27
+Revises: b5e0c4a7d2f8
+Create Date: 2026-10-18 11:24:05.871362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91a6e3f0c27'
+down_revision: Union[str, None] = 'b5e0c4a7d2f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ('Brukere', 'Innlegg'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade() -> None:
+    for table in ('Innlegg', 'Brukere'):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
@@ -1,29 +1,40 @@
+import asyncio
 import logging
 
-from sqlalchemy import Engine
-from sqlmodel import Session, select
-from tenacity import after_log, before_log, retry, stop_after_attempt, wait_fixed
+from tenacity import (
+    after_log,
+    before_log,
+    retry,
+    stop_after_delay,
+    wait_exponential,
+)
 
-from .helpers.db import engine
+# Imported for its side effect of registering the auth schemes' OpenID configs
+from .helpers import dependencies  # noqa: F401
+from .helpers.health import ping_database
+from .helpers.openid import openid_key_store
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-max_tries = 60 * 5  # 5 minutes
-wait_seconds = 1
+max_wait_seconds = 60 * 5  # 5 minutes
+
+
+async def check_openid() -> None:
+    if not await openid_key_store.refresh_all():
+        raise RuntimeError("Unable to load the OpenID config")
 
 
 @retry(
-    stop=stop_after_attempt(max_tries),
-    wait=wait_fixed(wait_seconds),
+    stop=stop_after_delay(max_wait_seconds),
+    wait=wait_exponential(multiplier=0.25, max=10),
     before=before_log(logger, logging.INFO),
     after=after_log(logger, logging.WARN),
 )
-def init(db_engine: Engine) -> None:
+async def init() -> None:
     try:
-        with Session(db_engine) as session:
-            # Try to create session to check if DB is awake
-            session.exec(select(1))
+        # Check that the DB is awake and the identity provider reachable at once
+        await asyncio.gather(ping_database(), check_openid())
     except Exception as e:
         logger.error(e)
         raise e
@@ -31,7 +42,7 @@ def init(db_engine: Engine) -> None:
 
 def main() -> None:
     logger.info("Initializing service")
-    init(engine)
+    asyncio.run(init())
     logger.info("Service finished initializing")
 
 
@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, NamedTuple
+
+import httpx
+from cachetools import TLRUCache
+
+from src.app.helpers.config import settings
+
+
+class OBOResult(NamedTuple):
+    success: bool
+    payload: Any
+
+
+class _CachedToken(NamedTuple):
+    payload: Any
+    expires_at: float
+
+
+async def exchange_obo_token(
+    client: httpx.AsyncClient, assertion: str, scope: str
+) -> httpx.Response:
+    """
+    Exchange the user's access token for a token to call `scope` on their behalf.
+    """
+    return await client.post(
+        f'https://login.microsoftonline.com/{settings.TENANT_ID}/oauth2/v2.0/token',
+        data={
+            'grant_type': 'urn:ietf:params:oauth:grant-type:jwt-bearer',
+            'client_id': settings.APP_CLIENT_ID,
+            'client_secret': settings.GRAPH_SECRET,
+            'assertion': assertion,
+            'scope': scope,
+            'requested_token_use': 'on_behalf_of',
+        },
+    )
+
+
+class OBOTokenCache:
+    def __init__(self, maxsize: int, expiry_skew: int) -> None:
+        """
+        Caches On-Behalf-Of tokens by a hash of the incoming assertion and scope,
+        until `expiry_skew` seconds before they expire.
+
+        Concurrent requests for the same key share a single in-flight exchange,
+        so a burst from one user triggers one token request.
+        """
+        self.expiry_skew = expiry_skew
+        self._tokens: TLRUCache = TLRUCache(  # type: ignore[type-arg]
+            maxsize=maxsize,
+            ttu=lambda _key, token, _now: token.expires_at,
+            timer=time.monotonic,
+        )
+        self._inflight: dict[str, asyncio.Task[OBOResult]] = {}
+
+    @staticmethod
+    def key(assertion: str, scope: str) -> str:
+        return hashlib.sha256(f'{scope}\0{assertion}'.encode()).hexdigest()
+
+    async def get(
+        self,
+        assertion: str,
+        scope: str,
+        exchange: Callable[[], Awaitable[httpx.Response]],
+    ) -> OBOResult:
+        key = self.key(assertion, scope)
+        token: _CachedToken | None = self._tokens.get(key)
+        if token is not None:
+            return OBOResult(success=True, payload=token.payload)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._exchange(key, exchange))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded, so a caller that disconnects doesn't cancel the exchange
+        # the other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _exchange(
+        self, key: str, exchange: Callable[[], Awaitable[httpx.Response]]
+    ) -> OBOResult:
+        response = await exchange()
+        payload = response.json()
+        if response.is_success:
+            lifetime = float(payload.get('expires_in', 0)) - self.expiry_skew
+            if lifetime > 0:
+                self._tokens[key] = _CachedToken(payload, time.monotonic() + lifetime)
+        return OBOResult(success=response.is_success, payload=payload)
+
+
+obo_token_cache = OBOTokenCache(
+    settings.OBO_CACHE_SIZE, settings.OBO_EXPIRY_SKEW_SECONDS
+)
@@ -0,0 +1,30 @@
+from typing import Any
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from src.app.helpers.health import readiness
+
+# Served at the root without auth, for orchestrator probes
+router = APIRouter(include_in_schema=False)
+
+
+@router.get("/livez")
+async def read_liveness() -> Any:
+    """
+    Report that the process is up and serving requests, touches nothing else.
+    """
+    return {"status": "UP"}
+
+
+@router.get("/readyz")
+async def read_readiness() -> Any:
+    """
+    Report whether the database answers and the OpenID config is loaded, from a
+    result cached for `HEALTH_CACHE_SECONDS`.
+
+    Returns:
+        Any: The status of each check, with 503 when any of them fails.
+    """
+    status = await readiness.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
@@ -0,0 +1,68 @@
+from typing import Any, Literal
+
+from fastapi import APIRouter, Depends
+
+from src.app.helpers.cache import post_cache, user_cache
+from src.app.helpers.db import get_async_engine, get_engine, get_replica_engines
+from src.app.helpers.dependencies import validate_is_admin_user
+from src.app.helpers.pool import pool_status
+from src.app.helpers.query_log import slow_query_log
+from src.app.helpers.replicas import replica_router
+
+router = APIRouter(dependencies=[Depends(validate_is_admin_user)])
+
+
+@router.get("/internal/cache", tags=["internal"])
+async def read_cache_stats() -> Any:
+    """
+    Retrieve the size and hit/miss/eviction counters of the entity caches.
+
+    Returns:
+        Any: The counters of the post and user caches.
+    """
+    return {"posts": post_cache.stats(), "users": user_cache.stats()}
+
+
+@router.get("/internal/pool", tags=["internal"])
+async def read_pool_stats() -> Any:
+    """
+    Retrieve connection pool usage of the sync, async and read replica engines.
+
+    Returns:
+        Any: Checked out and overflow connections, checkout wait times and
+            timeouts of each pool, and the health of each replica.
+    """
+    replica_pools = [
+        pool_status(engine.sync_engine.pool)  # type: ignore
+        for engine in get_replica_engines()
+    ]
+    return {
+        "async": pool_status(get_async_engine().sync_engine.pool),  # type: ignore
+        "sync": pool_status(get_engine().pool),  # type: ignore
+        "replicas": [
+            {**status, "pool": pool}
+            for status, pool in zip(replica_router.status(), replica_pools)
+        ],
+    }
+
+
+@router.get("/internal/queries", tags=["internal"])
+async def read_query_stats(
+    limit: int = 20, order_by: Literal["total", "mean", "max"] = "total"
+) -> Any:
+    """
+    Retrieve the statements that took the most time, per normalized statement.
+
+    Args:
+        limit (int, optional): Number of statements to return. Defaults to 20.
+        order_by (str, optional): Rank by total, mean or max duration. Defaults
+            to total.
+
+    Returns:
+        Any: Call counts, durations and the last captured plan of each statement.
+    """
+    return {
+        "threshold_ms": slow_query_log.threshold * 1000,
+        "untracked": slow_query_log.untracked,
+        "statements": slow_query_log.top(limit, order_by),
+    }
@@ -1,112 +1,332 @@
-from typing import Any
+from typing import Annotated, Any
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from .services import create_new_post, get_all_posts, get_post_by_id, update_post
-from src.app.helpers.dependencies import SessionDep
-from src.app.schemas.models import Post, PostCreate, PostsPublic
+from .services import (
+    create_new_post,
+    create_posts_bulk,
+    delete_post as delete_post_service,
+    get_all_posts,
+    get_post_by_id,
+    get_post_version,
+    get_posts_by_ids,
+    search_posts,
+    stream_posts_ndjson,
+    update_post,
+)
+from src.app.helpers.batch import parse_ids
+from src.app.helpers.conditional import (
+    none_match_hit,
+    parse_if_match,
+    validator_headers,
+)
+from src.app.helpers.dependencies import AsyncSessionDep, ReadSessionDep
+from src.app.helpers.replicas import PINNED
+from src.app.helpers.responses import (
+    fast_json,
+    post_adapter,
+    posts_batch_adapter,
+    posts_public_adapter,
+)
+from src.app.schemas.models import (
+    BulkCreateResult,
+    Post,
+    PostCreate,
+    PostsBatch,
+    PostsPublic,
+    PostUpdate,
+    User,
+)
 
 router = APIRouter()
 
 
 @router.get("/posts", response_model=PostsPublic, tags=["posts"])
-def read_posts(
-    session: SessionDep, author_id: int, skip: int = 0, limit: int = 10
+async def read_posts(
+    session: ReadSessionDep,
+    author_id: int,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: str | None = None,
+    with_count: bool = True,
 ) -> Any:
     """
     Retrieve posts by author ID.
 
     Args:
-        session (SessionDep): The database session dependency.
+        session (ReadSessionDep): The database session dependency.
         author_id (int): The ID of the author.
         skip (int, optional): Number of posts to skip. Defaults to 0.
         limit (int, optional): Maximum number of posts to retrieve. Defaults to 10.
+        cursor (str, optional): The `next_cursor` of a previous page. When given,
+            `skip` is ignored and the page starts right after that cursor.
+        with_count (bool, optional): Whether to include the author's total post
+            count. Defaults to True.
 
     Returns:
         Any: The retrieved posts or a JSON response with an error message if the author does not exist.
     """
-    posts = get_all_posts(session=session, author_id=author_id, skip=skip, limit=limit)
+    posts = await get_all_posts(
+        session=session,
+        author_id=author_id,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        with_count=with_count,
+    )
     if posts is None:
         return JSONResponse(
             status_code=404, content={"message": "Author does not exist"}
         )
-    return posts
+    return fast_json(posts_public_adapter, posts)
+
+
+# Registered before /posts/{post_id} so "export" is not parsed as a post id
+@router.get("/posts/export", tags=["posts"])
+async def export_posts(session: ReadSessionDep, author_id: int) -> Any:
+    """
+    Stream all posts of an author as newline-delimited JSON.
+
+    Args:
+        session (ReadSessionDep): The database session dependency.
+        author_id (int): The ID of the author.
+
+    Returns:
+        Any: A streaming `application/x-ndjson` response with one post per line,
+            or a JSON response with an error message if the author does not exist.
+    """
+    if await session.get(User, author_id) is None:
+        return JSONResponse(
+            status_code=404, content={"message": "Author does not exist"}
+        )
+    return StreamingResponse(
+        stream_posts_ndjson(author_id=author_id, pinned=PINNED in session.info),
+        media_type="application/x-ndjson",
+    )
+
+
+# Registered before /posts/{post_id} so "batch" is not parsed as a post id
+@router.get("/posts/batch", response_model=PostsBatch, tags=["posts"])
+async def read_posts_by_ids(session: ReadSessionDep, ids: str) -> Any:
+    """
+    Retrieve many posts by their IDs at once.
+
+    Args:
+        session (ReadSessionDep): The database session dependency.
+        ids (str): Comma separated post IDs, at most 100.
+
+    Returns:
+        Any: The posts that exist, in the requested order, and the IDs that don't.
+    """
+    posts = await get_posts_by_ids(session=session, post_ids=parse_ids(ids))
+    return fast_json(posts_batch_adapter, posts)
+
+
+# Registered before /posts/{post_id} so "search" is not parsed as a post id
+@router.get("/posts/search", response_model=PostsPublic, tags=["posts"])
+async def search_posts_by_text(
+    session: ReadSessionDep,
+    q: Annotated[str, Query(min_length=1, max_length=256)],
+    published_only: bool = False,
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    cursor: str | None = None,
+) -> Any:
+    """
+    Search post titles and content, best matches first.
+
+    Args:
+        session (ReadSessionDep): The database session dependency.
+        q (str): The search terms. Quoted phrases, `or` and `-` to exclude a
+            term are supported on Postgres.
+        published_only (bool, optional): Only return published posts. Defaults to False.
+        limit (int, optional): Maximum number of posts to retrieve. Defaults to 10.
+        cursor (str, optional): The `next_cursor` of a previous page.
+
+    Returns:
+        Any: The matching posts and the cursor of the next page, if any.
+    """
+    results = await search_posts(
+        session=session,
+        q=q,
+        published_only=published_only,
+        limit=limit,
+        cursor=cursor,
+    )
+    return fast_json(posts_public_adapter, results)
 
 
 @router.get("/posts/{post_id}", response_model=Post, tags=["posts"])
-def read_post_by_id(session: SessionDep, post_id: int) -> Any:
+async def read_post_by_id(
+    session: ReadSessionDep,
+    post_id: int,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Any:
     """
     Retrieve a post by its ID.
 
     Args:
-        session (SessionDep): The database session dependency.
+        session (ReadSessionDep): The database session dependency.
         post_id (int): The ID of the post to retrieve.
+        if_none_match (str, optional): ETags the client already has.
 
     Returns:
-        Any: The retrieved post.
+        Any: The retrieved post, or an empty 304 response when the client's
+            copy is current.
 
     Raises:
         JSONResponse: If the post is not found.
     """
-    post = get_post_by_id(
+    if if_none_match is not None:
+        # Only the version is needed to answer a revalidation
+        version = await get_post_version(session=session, post_id=post_id)
+        if version is None:
+            return JSONResponse(status_code=404, content={"message": "Post not found"})
+        if none_match_hit(if_none_match, version[0]):
+            return Response(status_code=304, headers=validator_headers(*version))
+
+    post = await get_post_by_id(
         session=session, post_id=post_id
     )  # session.get(Post, post_id) is the same as get_post_by_id but with less error handling
     if post is None:
         return JSONResponse(status_code=404, content={"message": "Post not found"})
-    return post
+    headers = validator_headers(post.version, post.updated_at)
+    return fast_json(post_adapter, post, headers=headers)
 
 
 @router.post("/posts", response_model=Post, tags=["posts"])
-def create_post(session: SessionDep, post: PostCreate, author_id: int) -> Any:
+async def create_post(
+    session: AsyncSessionDep, post: PostCreate, author_id: int
+) -> Any:
     """
     Create a new post.
 
     Args:
-        session (SessionDep): The database session.
+        session (AsyncSessionDep): The database session.
         post (PostCreate): The data for the new post.
         author_id (int): The ID of the post's author.
 
     Returns:
         Any: The created post.
     """
-    return create_new_post(
+    created = await create_new_post(
         session=session,
         post=post,
         author_id=author_id,  # type: ignore
     )
+    return fast_json(post_adapter, created)
+
+
+@router.post("/posts/bulk", response_model=BulkCreateResult, tags=["posts"])
+async def create_posts(
+    session: AsyncSessionDep,
+    posts: list[PostCreate],
+    author_id: int,
+    continue_on_error: bool = False,
+) -> Any:
+    """
+    Create many posts for an author in one transaction.
+
+    Args:
+        session (AsyncSessionDep): The database session.
+        posts (list[PostCreate]): The data for the new posts.
+        author_id (int): The ID of the posts' author.
+        continue_on_error (bool, optional): Keep the rows that succeeded when
+            some rows fail. Defaults to False, which rolls back the whole batch.
+
+    Returns:
+        Any: The generated ids, aligned with the submitted posts, and per-row errors.
+    """
+    result = await create_posts_bulk(
+        session=session,
+        posts=posts,
+        author_id=author_id,
+        continue_on_error=continue_on_error,
+    )
+    if result is None:
+        return JSONResponse(
+            status_code=404, content={"message": "Author does not exist"}
+        )
+    if result.errors and not continue_on_error:
+        return JSONResponse(status_code=409, content=result.model_dump())
+    return result
 
 
 @router.put("/posts/{post_id}", response_model=Post, tags=["posts"])
-def update_post_by_id(session: SessionDep, post_id: int, updated_post: Post) -> Any:
+async def update_post_by_id(
+    session: AsyncSessionDep,
+    post_id: int,
+    updated_post: Post,
+    if_match: Annotated[str | None, Header()] = None,
+) -> Any:
     """
     Update a post by its ID.
 
     Args:
-        session (SessionDep): The database session dependency.
+        session (AsyncSessionDep): The database session dependency.
         post_id (int): The ID of the post to be updated.
         updated_post (Post): The updated post data.
+        if_match (str, optional): The ETag the client last saw. When given, the
+            update only applies if the post was not changed since.
 
     Returns:
         Any: The updated post.
 
     Raises:
-        HTTPException: If the post with the given ID is not found.
+        HTTPException: If the post with the given ID is not found, or 412 if it
+            no longer matches `If-Match`.
     """
-    post = session.get(Post, post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="Item not found")
+    post = await update_post(
+        session=session,
+        post_id=post_id,
+        updated_post=updated_post,
+        expected_version=parse_if_match(if_match),
+    )
+    headers = validator_headers(post.version, post.updated_at)
+    return fast_json(post_adapter, post, headers=headers)
 
-    return update_post(session=session, post=post, updated_post=updated_post)
+
+@router.patch("/posts/{post_id}", response_model=Post, tags=["posts"])
+async def patch_post_by_id(
+    session: AsyncSessionDep,
+    post_id: int,
+    changes: PostUpdate,
+    if_match: Annotated[str | None, Header()] = None,
+) -> Any:
+    """
+    Partially update a post, only the fields in the body are written.
+
+    Args:
+        session (AsyncSessionDep): The database session dependency.
+        post_id (int): The ID of the post to be updated.
+        changes (PostUpdate): The fields to change.
+        if_match (str, optional): The ETag the client last saw. When given, the
+            update only applies if the post was not changed since.
+
+    Returns:
+        Any: The updated post.
+
+    Raises:
+        HTTPException: If the post with the given ID is not found, or 412 if it
+            no longer matches `If-Match`.
+    """
+    post = await update_post(
+        session=session,
+        post_id=post_id,
+        updated_post=changes,
+        expected_version=parse_if_match(if_match),
+    )
+    headers = validator_headers(post.version, post.updated_at)
+    return fast_json(post_adapter, post, headers=headers)
 
 
 @router.delete("/posts/{post_id}", tags=["posts"])
-def delete_post(session: SessionDep, post_id: int) -> JSONResponse:
+async def delete_post(session: AsyncSessionDep, post_id: int) -> JSONResponse:
     """
     Delete a post with the given post_id.
 
     Args:
-        session (SessionDep): The database session dependency.
+        session (AsyncSessionDep): The database session dependency.
         post_id (int): The ID of the post to be deleted.
 
     Returns:
@@ -115,10 +335,6 @@ def delete_post(session: SessionDep, post_id: int) -> JSONResponse:
             with a message indicating the deletion. If the post is not found,
             returns a 404 status code with a message indicating that the post was not found.
     """
-    post = session.get(Post, post_id)
-    if post is None:
+    if not await delete_post_service(session=session, post_id=post_id):
         return JSONResponse(status_code=404, content={"message": "Post not found"})
-    else:
-        session.delete(post)
-        session.commit()
-        return JSONResponse(status_code=204, content={"message": "Post deleted"})
+    return JSONResponse(status_code=204, content={"message": "Post deleted"})
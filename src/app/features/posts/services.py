@@ -1,48 +1,416 @@
-from typing import Any
-from sqlalchemy import Null
-from sqlmodel import select, func
+import base64
+import re
+from collections.abc import AsyncGenerator
+from datetime import datetime
 
-from src.app.helpers.dependencies import SessionDep
-from src.app.schemas.models import Post, PostCreate, PostsPublic
+from fastapi import HTTPException
+from sqlalchemy import (
+    Float,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    table,
+    tuple_,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
 
+from src.app.features.users.services import BULK_CHUNK_SIZE, adjust_post_counters
+from src.app.helpers.cache import post_cache, use_cache
+from src.app.helpers.replicas import replica_router
+from src.app.helpers.dependencies import AsyncSessionDep
+from src.app.schemas.models import (
+    BulkCreateResult,
+    BulkRowError,
+    Post,
+    PostCreate,
+    PostsBatch,
+    PostsPublic,
+    PostUpdate,
+    SEARCH_CONFIG,
+    User,
+    UserPostStats,
+    utcnow,
+)
 
-def get_post_by_id(*, session: SessionDep, post_id: int) -> Post | None:
-    statement = select(Post).where(Post.id == post_id)
-    return session.exec(statement).first()
+# Rows fetched per round trip by the NDJSON export
+EXPORT_BATCH_SIZE = 1000
 
 
-def get_all_posts(
-    *, session: SessionDep, author_id: int, skip: int = 0, limit: int = 10
-) -> Any:
-    count_statement = (
-        select(func.count()).select_from(Post).where(Post.author_id == author_id)
+async def get_post_by_id(*, session: AsyncSessionDep, post_id: int) -> Post | None:
+    post = post_cache.get(post_id) if use_cache(session) else None
+    if post is None:
+        statement = select(Post).where(Post.id == post_id)
+        post = (await session.exec(statement)).first()
+        if post is not None:
+            post_cache.set(post_id, post)
+    return post
+
+
+async def get_posts_by_ids(
+    *, session: AsyncSessionDep, post_ids: list[int]
+) -> PostsBatch:
+    """
+    Fetch many posts in the requested order, querying only the ids missing from
+    the cache, in a single IN query.
+    """
+    found = post_cache.get_many(post_ids) if use_cache(session) else {}
+    uncached = [post_id for post_id in post_ids if post_id not in found]
+    if uncached:
+        statement = select(Post).where(
+            Post.id.in_(uncached)  # type: ignore[union-attr]
+        )
+        for post in (await session.exec(statement)).all():
+            found[post.id] = post  # type: ignore[index]
+            post_cache.set(post.id, post)  # type: ignore[arg-type]
+    return PostsBatch(
+        data=[found[post_id] for post_id in post_ids if post_id in found],
+        missing=[post_id for post_id in post_ids if post_id not in found],
     )
-    count = session.exec(count_statement).first()
-    if count == 0:
-        return Null
+
+
+async def get_post_version(
+    *, session: AsyncSessionDep, post_id: int
+) -> tuple[int, datetime] | None:
+    """
+    Resolve the version of a post from the cache or a version-only query,
+    without loading the full row.
+    """
+    post = post_cache.get(post_id) if use_cache(session) else None
+    if post is not None:
+        return post.version, post.updated_at
+    statement = select(Post.version, Post.updated_at).where(Post.id == post_id)
+    row = (await session.exec(statement)).first()
+    return (row[0], row[1]) if row is not None else None
+
+
+def encode_cursor(author_id: int, post_id: int) -> str:
+    raw = f"{author_id}:{post_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        author_id, post_id = base64.urlsafe_b64decode(padded).decode().split(":")
+        return int(author_id), int(post_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def get_all_posts(
+    *,
+    session: AsyncSessionDep,
+    author_id: int,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: str | None = None,
+    with_count: bool = True,
+) -> PostsPublic | None:
+    count = None
+    if with_count:
+        stats = await session.get(UserPostStats, author_id)
+        count = stats.post_count if stats else 0
+        if count == 0:
+            return None
+
+    statement = select(Post).where(Post.author_id == author_id).order_by(Post.id)
+    if cursor is not None:
+        # Keyset pagination: seek past the last seen id instead of scanning and
+        # discarding `skip` rows, so deep pages cost the same as the first one
+        cursor_author_id, last_id = decode_cursor(cursor)
+        if cursor_author_id != author_id:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(Post.id > last_id)
+    else:
+        statement = statement.offset(skip)
+
+    # Fetch one extra row to know whether there is a next page
+    posts = list((await session.exec(statement.limit(limit + 1))).all())
+    if count is None and cursor is None and skip == 0 and not posts:
+        return None
+
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(author_id, posts[-1].id)  # type: ignore
+    return PostsPublic(data=posts, count=count, next_cursor=next_cursor)
+
+
+def encode_search_cursor(rank: float, post_id: int) -> str:
+    raw = f"{rank!r}:{post_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, post_id = base64.urlsafe_b64decode(padded).decode().split(":")
+        return float(rank), int(post_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def fts5_match(q: str) -> str:
+    """
+    Quote every word of `q`, so user input is never parsed as FTS5 query syntax.
+    Quoted terms separated by spaces must all match.
+    """
+    return " ".join(f'"{term}"' for term in re.findall(r"\w+", q))
+
+
+async def search_posts(
+    *,
+    session: AsyncSessionDep,
+    q: str,
+    published_only: bool = False,
+    limit: int = 10,
+    cursor: str | None = None,
+) -> PostsPublic:
+    """
+    Full-text search over post titles and content, best matches first, with
+    title matches weighted above content matches.
+
+    Postgres matches `websearch_to_tsquery` against the indexed `search_vector`
+    column and ranks with `ts_rank_cd`, SQLite falls back to the FTS5 table and
+    `bm25`. Pages are keyset paginated on (rank, id).
+    """
+    if session.bind.dialect.name == "sqlite":  # type: ignore
+        match = fts5_match(q)
+        if not match:
+            return PostsPublic(data=[])
+        fts_table = table("Innlegg_fts", column("rowid"))
+        fts = literal_column('"Innlegg_fts"')
+        # bm25 is lower for better matches, negate it so both rank descending
+        rank = -func.bm25(fts, 10.0, 1.0)
+        statement = (
+            select(Post, rank)
+            .join(fts_table, fts_table.c.rowid == Post.id)
+            .where(fts.op("MATCH")(match))
+        )
+    else:
+        query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        vector = literal_column('"Innlegg".search_vector')
+        # ts_rank_cd returns real, widen it so the rank in the cursor round-trips
+        # exactly through the double precision literal it is compared with
+        rank = cast(func.ts_rank_cd(vector, query), Float(53))
+        statement = select(Post, rank).where(vector.op("@@")(query))
+
+    if published_only:
+        statement = statement.where(Post.published)
+    if cursor is not None:
+        last_rank, last_id = decode_search_cursor(cursor)
+        statement = statement.where(
+            tuple_(rank, Post.id) < tuple_(literal(last_rank), last_id)
+        )
+    statement = statement.order_by(rank.desc(), Post.id.desc()).limit(limit + 1)
+
+    rows = list((await session.exec(statement)).all())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_post, last_rank = rows[-1]
+        next_cursor = encode_search_cursor(last_rank, last_post.id)  # type: ignore
+    return PostsPublic(data=[post for post, _ in rows], next_cursor=next_cursor)
+
+
+async def stream_posts_ndjson(
+    *, author_id: int, pinned: bool = False
+) -> AsyncGenerator[bytes, None]:
+    """
+    Yield all posts of an author as newline-delimited JSON, one chunk per batch.
+
+    Rows are read through a server-side cursor `EXPORT_BATCH_SIZE` at a time, so
+    memory use does not depend on how many posts the author has. The generator
+    opens its own session, on a read replica unless `pinned`, because request
+    scoped sessions are closed before a streaming response body is sent.
+    """
     statement = (
-        select(Post).where(Post.author_id == author_id).offset(skip).limit(limit)
+        select(Post)
+        .where(Post.author_id == author_id)
+        .order_by(Post.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
     )
-    posts = session.exec(statement).all()
-    return PostsPublic(data=posts, count=count)  # type: ignore
+    async with replica_router.session(pinned=pinned) as session:
+        result = await session.stream(statement)
+        async for partition in result.scalars().partitions():
+            lines = (post.model_dump_json().encode() + b"\n" for post in partition)
+            yield b"".join(lines)
+            session.expunge_all()
 
 
-def create_new_post(*, session: SessionDep, post: PostCreate, author_id: int) -> Post:
-    db_post = Post.model_validate(post, update={"author_id": author_id})
-    session.add(db_post)
-    session.commit()
-    session.refresh(db_post)
+async def create_new_post(
+    *, session: AsyncSessionDep, post: PostCreate, author_id: int
+) -> Post:
+    """
+    Insert the post with a single INSERT .. RETURNING, which hands back the
+    generated columns without a refresh after commit.
+    """
+    values = Post.model_validate(post, update={"author_id": author_id}).model_dump(
+        exclude={"id"}
+    )
+    statement = insert(Post).values(**values).returning(Post)
+    db_post = (await session.execute(statement)).scalars().one()
+    await adjust_post_counters(
+        session=session,
+        author_id=author_id,
+        total=1,
+        published=int(db_post.published),
+    )
+    await session.commit()
     return db_post
 
 
-def update_post(*, session: SessionDep, post: Post, updated_post: Post) -> Post:
-    update_dict = updated_post.model_dump(exclude_unset=True)
-    post.sqlmodel_update(update_dict)
-    session.commit()
-    session.refresh(post)
+async def create_posts_bulk(
+    *,
+    session: AsyncSessionDep,
+    posts: list[PostCreate],
+    author_id: int,
+    continue_on_error: bool,
+) -> BulkCreateResult | None:
+    """
+    Insert posts for one author with chunked multi-row statements in a single
+    transaction. Returns None when the author does not exist.
+
+    With `continue_on_error` every chunk runs in a savepoint and the rows of a
+    failing chunk are reported in `errors`, otherwise the first failure rolls
+    back the whole batch.
+    """
+    if await session.get(User, author_id) is None:
+        return None
+
+    ids: list[int | None] = [None] * len(posts)
+    errors: list[BulkRowError] = []
+    published = 0
+    # executemany with RETURNING is batched into multi-row INSERTs by SQLAlchemy,
+    # sort_by_parameter_order keeps the returned ids aligned with the rows
+    statement = insert(Post).returning(Post.id, sort_by_parameter_order=True)
+    for start in range(0, len(posts), BULK_CHUNK_SIZE):
+        chunk = posts[start : start + BULK_CHUNK_SIZE]
+        rows = [{**post.model_dump(), "author_id": author_id} for post in chunk]
+        try:
+            if continue_on_error:
+                async with session.begin_nested():
+                    new_ids = (await session.execute(statement, rows)).scalars().all()
+            else:
+                new_ids = (await session.execute(statement, rows)).scalars().all()
+        except IntegrityError as error:
+            errors.extend(
+                BulkRowError(index=start + offset, detail=str(error.orig))
+                for offset in range(len(chunk))
+            )
+            if not continue_on_error:
+                await session.rollback()
+                return BulkCreateResult(ids=[None] * len(posts), errors=errors)
+            continue
+        ids[start : start + len(chunk)] = new_ids
+        published += sum(post.published for post in chunk)
+
+    created = len(posts) - len(errors)
+    if created:
+        await adjust_post_counters(
+            session=session, author_id=author_id, total=created, published=published
+        )
+    await session.commit()
+    return BulkCreateResult(ids=ids, errors=errors)
+
+
+async def update_post(
+    *,
+    session: AsyncSessionDep,
+    post_id: int,
+    updated_post: Post | PostUpdate,
+    expected_version: int | None = None,
+) -> Post:
+    """
+    Apply `updated_post` with a single version guarded UPDATE .. RETURNING.
+
+    When `published` or `author_id` change, the previous values are read first
+    (they drive the author counters) and the UPDATE is guarded by the version
+    that was read, so a concurrent write can never be counted twice.
+
+    :raises HTTPException 404 when the post does not exist, 412 when its version
+    is not `expected_version`
+    """
+    changes = updated_post.model_dump(
+        exclude_unset=True, exclude_none=True, exclude={"id", "version", "updated_at"}
+    )
+    old = None
+    if "published" in changes or "author_id" in changes:
+        old_statement = select(Post.author_id, Post.published, Post.version).where(
+            Post.id == post_id
+        )
+        old = (await session.exec(old_statement)).first()
+        if old is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        if expected_version is not None and old.version != expected_version:
+            raise HTTPException(status_code=412, detail="Precondition failed")
+        expected_version = old.version
+
+    statement = update(Post).where(Post.id == post_id)  # type: ignore
+    if expected_version is not None:
+        statement = statement.where(Post.version == expected_version)  # type: ignore
+    statement = statement.values(
+        **changes, version=Post.version + 1, updated_at=utcnow()
+    ).returning(Post)
+    post = (await session.execute(statement)).scalars().first()
+    if post is None:
+        await session.rollback()
+        exists = select(Post.id).where(Post.id == post_id)
+        if expected_version is None or (await session.exec(exists)).first() is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        raise HTTPException(status_code=412, detail="Precondition failed")
+
+    if old is not None and post.author_id != old.author_id:
+        await adjust_post_counters(
+            session=session,
+            author_id=old.author_id,
+            total=-1,
+            published=-int(old.published),
+        )
+        await adjust_post_counters(
+            session=session,
+            author_id=post.author_id,  # type: ignore
+            total=1,
+            published=int(post.published),
+        )
+    elif old is not None and post.published != old.published:
+        await adjust_post_counters(
+            session=session,
+            author_id=post.author_id,  # type: ignore
+            total=0,
+            published=1 if post.published else -1,
+        )
+    await session.commit()
+    post_cache.invalidate(post_id)
     return post
 
 
-def delete_post(*, session: SessionDep, post: Post) -> None:
-    session.delete(post)
-    session.commit()
+async def delete_post(*, session: AsyncSessionDep, post_id: int) -> bool:
+    """
+    Delete with a single DELETE .. RETURNING of the columns the author counters
+    need, without loading the row first. Returns False when there was no post.
+    """
+    statement = (
+        delete(Post)
+        .where(Post.id == post_id)  # type: ignore[arg-type]
+        .returning(Post.author_id, Post.published)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = (await session.execute(statement)).first()
+    if deleted is None:
+        return False
+    await adjust_post_counters(
+        session=session,
+        author_id=deleted.author_id,
+        total=-1,
+        published=-int(deleted.published),
+    )
+    await session.commit()
+    post_cache.invalidate(post_id)
+    return True
@@ -1,49 +1,367 @@
+import base64
+from datetime import datetime
+
 from fastapi import HTTPException
-from sqlmodel import Session, select
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.app.helpers.cache import user_cache, use_cache
+from src.app.helpers.dependencies import AsyncSessionDep
+from src.app.schemas.models import (
+    BulkCreateResult,
+    BulkRowError,
+    Post,
+    User,
+    UserCreate,
+    UserPostStats,
+    UsersBatch,
+    UsersPublic,
+    UserUpdate,
+    UserWithPosts,
+    utcnow,
+)
+
+# Rows per multi-row INSERT statement in the bulk endpoints
+BULK_CHUNK_SIZE = 500
+
+# Values accepted by `include`, mapped to whether only published posts are loaded
+INCLUDE_OPTIONS = {"posts": False, "posts:published": True}
+
 
-from src.app.helpers.dependencies import SessionDep
-from src.app.schemas.models import User
+def dialect_insert(session: AsyncSession):  # type: ignore[no-untyped-def]
+    """
+    Return the dialect specific `insert` construct, which supports ON CONFLICT.
+    """
+    dialect = session.bind.dialect.name  # type: ignore
+    return postgresql.insert if dialect == "postgresql" else sqlite.insert
 
 
-def create_new_user(*, session: Session, user: User) -> User:
-    db_obj = User.model_validate(user)
-    session.add(db_obj)
-    session.commit()
-    session.refresh(db_obj)
+async def create_new_user(*, session: AsyncSession, user: User) -> User:
+    """
+    Insert the user with INSERT .. RETURNING and its counters row with a second
+    INSERT, without a flush or a refresh after commit.
+    """
+    values = User.model_validate(user).model_dump(exclude={"id"})
+    statement = insert(User).values(**values).returning(User)
+    db_obj = (await session.execute(statement)).scalars().one()
+    await session.execute(insert(UserPostStats).values(user_id=db_obj.id))
+    await session.commit()
     return db_obj
 
 
-def get_user_by_id(*, session: SessionDep, user_id: int) -> User | None:
-    statement = select(User).where(User.id == user_id)
-    user = session.exec(statement).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def create_users_bulk(
+    *, session: AsyncSession, users: list[UserCreate], continue_on_error: bool
+) -> BulkCreateResult:
+    """
+    Insert users with chunked multi-row statements in a single transaction.
+
+    Rows whose email is repeated in the batch or already registered are reported
+    in `errors`. Unless `continue_on_error` is set, any error rolls back the whole
+    batch and no ids are returned.
+    """
+    ids: list[int | None] = [None] * len(users)
+    errors: list[BulkRowError] = []
+
+    pending: dict[str, int] = {}
+    for index, user in enumerate(users):
+        if user.email in pending:
+            errors.append(BulkRowError(index=index, detail="Duplicate email in batch"))
+        else:
+            pending[user.email] = index
+
+    statement = select(User.email).where(User.email.in_(pending))  # type: ignore
+    for email in (await session.exec(statement)).all():
+        index = pending.pop(email)
+        errors.append(BulkRowError(index=index, detail="Email already registered"))
+
+    insert = dialect_insert(session)
+    if not errors or continue_on_error:
+        rows = list(pending.items())
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            chunk = rows[start : start + BULK_CHUNK_SIZE]
+            # Emails registered concurrently since the check above are skipped
+            # by the database and reported like the ones found up front
+            insert_statement = (
+                insert(User)
+                .values([users[index].model_dump() for _, index in chunk])
+                .on_conflict_do_nothing(index_elements=[User.email])
+                .returning(User.id, User.email)
+            )
+            result = await session.execute(insert_statement)
+            inserted = {email: user_id for user_id, email in result.all()}
+            for email, index in chunk:
+                if email in inserted:
+                    ids[index] = inserted[email]
+                else:
+                    errors.append(
+                        BulkRowError(index=index, detail="Email already registered")
+                    )
+
+    errors.sort(key=lambda error: error.index)
+    if errors and not continue_on_error:
+        await session.rollback()
+        return BulkCreateResult(ids=[None] * len(users), errors=errors)
+
+    new_ids = [user_id for user_id in ids if user_id is not None]
+    for start in range(0, len(new_ids), BULK_CHUNK_SIZE):
+        chunk_ids = new_ids[start : start + BULK_CHUNK_SIZE]
+        await session.execute(
+            insert(UserPostStats).values([{"user_id": i} for i in chunk_ids])
+        )
+    await session.commit()
+    return BulkCreateResult(ids=ids, errors=errors)
+
+
+async def get_user_by_id(*, session: AsyncSessionDep, user_id: int) -> User | None:
+    user = user_cache.get(user_id) if use_cache(session) else None
+    if user is None:
+        statement = select(User).where(User.id == user_id)
+        user = (await session.exec(statement)).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_cache.set(user_id, user)
     return user
 
 
-def get_user_by_email(*, session: Session, email: str) -> User | None:
+async def get_users_by_ids(*, session: AsyncSession, user_ids: list[int]) -> UsersBatch:
+    """
+    Fetch many users in the requested order, querying only the ids missing from
+    the cache, in a single IN query.
+    """
+    found = user_cache.get_many(user_ids) if use_cache(session) else {}
+    uncached = [user_id for user_id in user_ids if user_id not in found]
+    if uncached:
+        statement = select(User).where(
+            User.id.in_(uncached)  # type: ignore[union-attr]
+        )
+        for user in (await session.exec(statement)).all():
+            found[user.id] = user  # type: ignore[index]
+            user_cache.set(user.id, user)  # type: ignore[arg-type]
+    return UsersBatch(
+        data=[found[user_id] for user_id in user_ids if user_id in found],
+        missing=[user_id for user_id in user_ids if user_id not in found],
+    )
+
+
+def parse_include(include: str | None) -> tuple[bool, bool]:
+    """
+    Return whether posts should be included, and whether only published ones.
+    :raises HTTPException 400 for anything but `posts` or `posts:published`
+    """
+    if include is None:
+        return False, False
+    if include not in INCLUDE_OPTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"include must be one of {', '.join(INCLUDE_OPTIONS)}",
+        )
+    return True, INCLUDE_OPTIONS[include]
+
+
+async def get_latest_posts(
+    *,
+    session: AsyncSession,
+    author_ids: list[int],
+    limit: int,
+    published_only: bool = False,
+) -> dict[int, list[Post]]:
+    """
+    Load the latest `limit` posts of each author in a single query.
+
+    This is the query `selectinload(User.posts)` would emit, one IN over the
+    author ids, with a ROW_NUMBER per author added since selectinload can't
+    limit the rows loaded per parent.
+    """
+    posts_by_author: dict[int, list[Post]] = {author_id: [] for author_id in author_ids}
+    if not author_ids:
+        return posts_by_author
+    position = func.row_number().over(
+        partition_by=Post.author_id, order_by=Post.id.desc()
+    )
+    ranked = select(Post.id, position.label("position")).where(
+        Post.author_id.in_(author_ids)  # type: ignore[union-attr]
+    )
+    if published_only:
+        ranked = ranked.where(Post.published)
+    latest = ranked.subquery()
+    statement = (
+        select(Post)
+        .join(latest, latest.c.id == Post.id)
+        .where(latest.c.position <= limit)
+        .order_by(Post.author_id, Post.id.desc())  # type: ignore[union-attr]
+    )
+    for post in (await session.exec(statement)).all():
+        posts_by_author[post.author_id].append(post)  # type: ignore[index]
+    return posts_by_author
+
+
+async def get_user_with_posts(
+    *, session: AsyncSession, user_id: int, posts_limit: int, published_only: bool
+) -> UserWithPosts:
+    user = await get_user_by_id(session=session, user_id=user_id)
+    posts = await get_latest_posts(
+        session=session,
+        author_ids=[user_id],
+        limit=posts_limit,
+        published_only=published_only,
+    )
+    return UserWithPosts.model_validate(user, update={"posts": posts[user_id]})
+
+
+def encode_user_cursor(user_id: int) -> str:
+    return base64.urlsafe_b64encode(str(user_id).encode()).decode().rstrip("=")
+
+
+def decode_user_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded).decode())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def list_users(
+    *,
+    session: AsyncSession,
+    limit: int = 10,
+    cursor: str | None = None,
+    include_posts: bool = False,
+    published_only: bool = False,
+    posts_limit: int = 10,
+) -> UsersPublic:
+    """
+    Page through users by id. With `include_posts`, each user's latest posts
+    are loaded too, a page costs two queries however many users it has.
+    """
+    statement = select(User).order_by(User.id)
+    if cursor is not None:
+        statement = statement.where(User.id > decode_user_cursor(cursor))
+    # Fetch one extra row to know whether there is a next page
+    users = list((await session.exec(statement.limit(limit + 1))).all())
+
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_user_cursor(users[-1].id)  # type: ignore[arg-type]
+
+    # Pass `posts` explicitly, reading `User.posts` would lazy load them per user
+    data = [
+        UserWithPosts.model_validate(user, update={"posts": None}) for user in users
+    ]
+    if include_posts:
+        posts = await get_latest_posts(
+            session=session,
+            author_ids=[user.id for user in data],
+            limit=posts_limit,
+            published_only=published_only,
+        )
+        for user in data:
+            user.posts = posts[user.id]
+    return UsersPublic(data=data, next_cursor=next_cursor)
+
+
+async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
     statement = select(User).where(User.email == email)
-    session_user = session.exec(statement).first()
+    session_user = (await session.exec(statement)).first()
     return session_user
 
 
-def update_user(*, session: Session, user_id: int, updated_user: User) -> User:
-    user = session.get(User, user_id)
+async def get_user_version(
+    *, session: AsyncSession, user_id: int
+) -> tuple[int, datetime] | None:
+    """
+    Resolve the version of a user from the cache or a version-only query,
+    without loading the full row.
+    """
+    user = user_cache.get(user_id) if use_cache(session) else None
+    if user is not None:
+        return user.version, user.updated_at
+    statement = select(User.version, User.updated_at).where(User.id == user_id)
+    row = (await session.exec(statement)).first()
+    return (row[0], row[1]) if row is not None else None
+
+
+async def update_user(
+    *,
+    session: AsyncSession,
+    user_id: int,
+    updated_user: User | UserUpdate,
+    expected_version: int | None = None,
+) -> User:
+    changes = updated_user.model_dump(
+        exclude_unset=True, exclude_none=True, exclude={"id", "version", "updated_at"}
+    )
+    statement = update(User).where(User.id == user_id)  # type: ignore
+    if expected_version is not None:
+        statement = statement.where(User.version == expected_version)  # type: ignore
+    statement = statement.values(
+        **changes, version=User.version + 1, updated_at=utcnow()
+    ).returning(User)
+    user = (await session.execute(statement)).scalars().first()
     if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+        await session.rollback()
+        exists = select(User.id).where(User.id == user_id)
+        if expected_version is None or (await session.exec(exists)).first() is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        raise HTTPException(status_code=412, detail="Precondition failed")
 
-    user_dict = updated_user.model_dump(exclude_unset=True)
-    user.sqlmodel_update(user_dict)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    user_cache.invalidate(user_id)
     return user
 
 
 # deleting a user
-def remove_user_by_id(*, session: Session, user_id: int) -> None:
-    user = session.get(User, user_id)
-    if not user:
+async def remove_user_by_id(*, session: AsyncSession, user_id: int) -> None:
+    statement = delete(UserPostStats).where(
+        UserPostStats.user_id == user_id  # type: ignore
+    )
+    await session.execute(statement)
+    statement = (
+        delete(User)
+        .where(User.id == user_id)  # type: ignore[arg-type]
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    if (await session.execute(statement)).first() is None:
+        await session.rollback()
         raise HTTPException(status_code=404, detail="User not found")
-    else:
-        session.delete(user)
-        session.commit()
+    await session.commit()
+    user_cache.invalidate(user_id)
+
+
+async def get_user_stats(*, session: AsyncSession, user_id: int) -> UserPostStats:
+    stats = await session.get(UserPostStats, user_id)
+    if stats is None:
+        # Users created before the counters existed have no row until the
+        # reconciliation command has run, they have no posts counted yet
+        await get_user_by_id(session=session, user_id=user_id)
+        return UserPostStats(user_id=user_id)
+    return stats
+
+
+async def adjust_post_counters(
+    *, session: AsyncSession, author_id: int, total: int, published: int
+) -> None:
+    """
+    Add the given deltas to an author's post counters without committing, so the
+    change lands in the same transaction as the post write that caused it.
+    """
+    insert = dialect_insert(session)
+    statement = (
+        insert(UserPostStats)
+        .values(
+            user_id=author_id,
+            post_count=max(total, 0),
+            published_count=max(published, 0),
+        )
+        .on_conflict_do_update(
+            index_elements=[UserPostStats.user_id],
+            set_={
+                "post_count": UserPostStats.post_count + total,
+                "published_count": UserPostStats.published_count + published,
+            },
+        )
+    )
+    await session.execute(statement)
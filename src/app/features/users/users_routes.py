@@ -1,74 +1,287 @@
-from .services import get_user_by_id, remove_user_by_id, update_user, create_new_user
+from .services import (
+    get_user_by_id,
+    get_user_with_posts,
+    get_users_by_ids,
+    list_users,
+    parse_include,
+    get_user_version,
+    get_user_stats,
+    remove_user_by_id,
+    update_user,
+    create_new_user,
+    create_users_bulk,
+)
 
-from typing import Any
+from typing import Annotated, Any
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 
-from src.app.helpers.dependencies import SessionDep
-from src.app.schemas.models import User
+from src.app.helpers.batch import parse_ids
+from src.app.helpers.conditional import (
+    none_match_hit,
+    parse_if_match,
+    validator_headers,
+)
+from src.app.helpers.dependencies import AsyncSessionDep, ReadSessionDep
+from src.app.helpers.responses import (
+    fast_json,
+    user_adapter,
+    user_stats_adapter,
+    user_with_posts_adapter,
+    users_batch_adapter,
+    users_public_adapter,
+)
+from src.app.schemas.models import (
+    BulkCreateResult,
+    User,
+    UserCreate,
+    UserPostStats,
+    UsersBatch,
+    UsersPublic,
+    UserUpdate,
+    UserWithPosts,
+)
+
+# Upper bound of the posts loaded per user by `include=posts`
+MAX_POSTS_PER_USER = 100
 
 router = APIRouter()
 
 
-@router.get("/users/{user_id}", response_model=User, tags=["users"])
-def read_user_by_id(session: SessionDep, user_id: int) -> Any:
+@router.get("/users", response_model=UsersPublic, tags=["users"])
+async def read_users(
+    session: ReadSessionDep,
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    cursor: str | None = None,
+    include: str | None = None,
+    posts_limit: Annotated[int, Query(ge=1, le=MAX_POSTS_PER_USER)] = 10,
+) -> Any:
+    """
+    Retrieve a page of users, optionally with their latest posts.
+
+    Args:
+        session (ReadSessionDep): The database session dependency.
+        limit (int, optional): Maximum number of users to retrieve. Defaults to 10.
+        cursor (str, optional): The `next_cursor` of a previous page.
+        include (str, optional): `posts` to include each user's latest posts, or
+            `posts:published` for only their published ones.
+        posts_limit (int, optional): Maximum number of posts per user. Defaults to 10.
+
+    Returns:
+        Any: The users and the cursor of the next page, if any.
+
+    """
+    include_posts, published_only = parse_include(include)
+    users = await list_users(
+        session=session,
+        limit=limit,
+        cursor=cursor,
+        include_posts=include_posts,
+        published_only=published_only,
+        posts_limit=posts_limit,
+    )
+    return fast_json(users_public_adapter, users)
+
+
+# Registered before /users/{user_id} so "batch" is not parsed as a user id
+@router.get("/users/batch", response_model=UsersBatch, tags=["users"])
+async def read_users_by_ids(session: ReadSessionDep, ids: str) -> Any:
+    """
+    Retrieve many users by their IDs at once.
+
+    Args:
+        session (ReadSessionDep): The database session dependency.
+        ids (str): Comma separated user IDs, at most 100.
+
+    Returns:
+        Any: The users that exist, in the requested order, and the IDs that don't.
+
+    """
+    users = await get_users_by_ids(session=session, user_ids=parse_ids(ids))
+    return fast_json(users_batch_adapter, users)
+
+
+@router.get("/users/{user_id}", response_model=UserWithPosts, tags=["users"])
+async def read_user_by_id(
+    session: ReadSessionDep,
+    user_id: int,
+    if_none_match: Annotated[str | None, Header()] = None,
+    include: str | None = None,
+    posts_limit: Annotated[int, Query(ge=1, le=MAX_POSTS_PER_USER)] = 10,
+) -> Any:
     """
     Retrieve a user by their ID.
 
     Args:
-        session (SessionDep): The database session dependency.
+        session (ReadSessionDep): The database session dependency.
         user_id (int): The ID of the user to retrieve.
+        if_none_match (str, optional): ETags the client already has.
+        include (str, optional): `posts` to include the user's latest posts, or
+            `posts:published` for only their published ones.
+        posts_limit (int, optional): Maximum number of posts. Defaults to 10.
+
+    Returns:
+        Any: The user object, or an empty 304 response when the client's copy
+            is current.
+
+    """
+    include_posts, published_only = parse_include(include)
+    if include_posts:
+        # The ETag only covers the user, so responses with posts carry none
+        user_with_posts = await get_user_with_posts(
+            session=session,
+            user_id=user_id,
+            posts_limit=posts_limit,
+            published_only=published_only,
+        )
+        return fast_json(user_with_posts_adapter, user_with_posts)
+
+    if if_none_match is not None:
+        # Only the version is needed to answer a revalidation
+        version = await get_user_version(session=session, user_id=user_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        if none_match_hit(if_none_match, version[0]):
+            return Response(status_code=304, headers=validator_headers(*version))
+
+    user = await get_user_by_id(session=session, user_id=user_id)
+    headers = validator_headers(user.version, user.updated_at)  # type: ignore
+    return fast_json(user_adapter, user, headers=headers)
+
+
+@router.get("/users/{user_id}/stats", response_model=UserPostStats, tags=["users"])
+async def read_user_stats(session: ReadSessionDep, user_id: int) -> Any:
+    """
+    Retrieve the post counters of a user.
+
+    Args:
+        session (ReadSessionDep): The database session dependency.
+        user_id (int): The ID of the user.
 
     Returns:
-        Any: The user object.
+        Any: The total and published post counts of the user.
 
     """
-    return get_user_by_id(session=session, user_id=user_id)
+    stats = await get_user_stats(session=session, user_id=user_id)
+    return fast_json(user_stats_adapter, stats)
 
 
 @router.post("/users", response_model=User, tags=["users"])
-def create_user(session: SessionDep, user: User) -> Any:
+async def create_user(session: AsyncSessionDep, user: User) -> Any:
     """
     Create a new user.
 
     Args:
-        session (SessionDep): The database session.
+        session (AsyncSessionDep): The database session.
         user (User): The user data.
 
     Returns:
         Any: The created user.
 
     """
-    return create_new_user(session=session, user=user)
+    created = await create_new_user(session=session, user=user)
+    return fast_json(user_adapter, created)
+
+
+@router.post("/users/bulk", response_model=BulkCreateResult, tags=["users"])
+async def create_users(
+    session: AsyncSessionDep, users: list[UserCreate], continue_on_error: bool = False
+) -> Any:
+    """
+    Create many users in one transaction.
+
+    Args:
+        session (AsyncSessionDep): The database session.
+        users (list[UserCreate]): The user data.
+        continue_on_error (bool, optional): Keep the rows that succeeded when
+            some rows fail, e.g. on duplicate emails. Defaults to False, which
+            rolls back the whole batch.
+
+    Returns:
+        Any: The generated ids, aligned with the submitted users, and per-row errors.
+
+    """
+    result = await create_users_bulk(
+        session=session, users=users, continue_on_error=continue_on_error
+    )
+    if result.errors and not continue_on_error:
+        return JSONResponse(status_code=409, content=result.model_dump())
+    return result
 
 
 @router.put("/users/{user_id}", response_model=User, tags=["users"])
-def put_user(session: SessionDep, user_id: int, user: User) -> Any:
+async def put_user(
+    session: AsyncSessionDep,
+    user_id: int,
+    user: User,
+    if_match: Annotated[str | None, Header()] = None,
+) -> Any:
     """
     Update a user with the specified user_id.
 
     Args:
-        session (SessionDep): The database session.
+        session (AsyncSessionDep): The database session.
         user_id (int): The ID of the user to update.
         user (User): The updated user object.
+        if_match (str, optional): The ETag the client last saw. When given, the
+            update only applies if the user was not changed since.
+
+    Returns:
+        Any: The updated user object.
+
+    """
+    updated = await update_user(
+        session=session,
+        user_id=user_id,
+        updated_user=user,
+        expected_version=parse_if_match(if_match),
+    )
+    headers = validator_headers(updated.version, updated.updated_at)
+    return fast_json(user_adapter, updated, headers=headers)
+
+
+@router.patch("/users/{user_id}", response_model=User, tags=["users"])
+async def patch_user(
+    session: AsyncSessionDep,
+    user_id: int,
+    changes: UserUpdate,
+    if_match: Annotated[str | None, Header()] = None,
+) -> Any:
+    """
+    Partially update a user, only the fields in the body are written.
+
+    Args:
+        session (AsyncSessionDep): The database session.
+        user_id (int): The ID of the user to update.
+        changes (UserUpdate): The fields to change.
+        if_match (str, optional): The ETag the client last saw. When given, the
+            update only applies if the user was not changed since.
 
     Returns:
         Any: The updated user object.
 
     """
-    return update_user(session=session, user_id=user_id, updated_user=user)
+    updated = await update_user(
+        session=session,
+        user_id=user_id,
+        updated_user=changes,
+        expected_version=parse_if_match(if_match),
+    )
+    headers = validator_headers(updated.version, updated.updated_at)
+    return fast_json(user_adapter, updated, headers=headers)
 
 
 @router.delete("/users/{user_id}", tags=["users"])
-def delete_user(session: SessionDep, user_id: int) -> Any:
+async def delete_user(session: AsyncSessionDep, user_id: int) -> Any:
     """
     Delete a user by their ID.
 
     Args:
-        session (SessionDep): The database session.
+        session (AsyncSessionDep): The database session.
         user_id (int): The ID of the user to delete.
 
     Returns:
         Any: The result of removing the user.
     """
-    return remove_user_by_id(session=session, user_id=user_id)
+    return await remove_user_by_id(session=session, user_id=user_id)
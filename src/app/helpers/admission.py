@@ -0,0 +1,156 @@
+import asyncio
+import math
+from collections.abc import AsyncGenerator
+
+import anyio.to_thread
+from fastapi import HTTPException
+
+from .config import settings
+from .metrics import _labels
+
+
+class AdmissionLimiter:
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        queue_size: int,
+        timeout: float,
+        retry_after: float,
+    ) -> None:
+        """
+        Admission control for one router, used as a FastAPI dependency.
+
+        At most `concurrency` requests are handled at once, up to `queue_size`
+        more wait for a slot for at most `timeout` seconds. Requests that find the
+        queue full, or whose wait times out, get a 503 with `Retry-After` right
+        away instead of piling up on the connection pool or the thread pool.
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = str(max(math.ceil(retry_after), 1))
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    async def __call__(self) -> AsyncGenerator[None, None]:
+        await self._acquire()
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def _acquire(self) -> None:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+        if self.waiting >= self.queue_size:
+            self.rejected_full += 1
+            raise self._overloaded()
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(self.timeout):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            self.rejected_timeout += 1
+            raise self._overloaded() from None
+        finally:
+            self.waiting -= 1
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="Server is overloaded, try again later",
+            headers={"Retry-After": self.retry_after},
+        )
+
+
+class AdmissionControl:
+    def __init__(self) -> None:
+        """
+        Holds the limiter of each router, created with the admission settings.
+        """
+        self.limiters: dict[str, AdmissionLimiter] = {}
+
+    def limiter(self, name: str) -> AdmissionLimiter:
+        limiter = self.limiters.get(name)
+        if limiter is None:
+            concurrency = settings.ADMISSION_CONCURRENCY or (
+                settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+            )
+            limiter = self.limiters[name] = AdmissionLimiter(
+                name,
+                concurrency,
+                settings.ADMISSION_QUEUE_SIZE,
+                settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                settings.ADMISSION_RETRY_AFTER_SECONDS,
+            )
+        return limiter
+
+    def configure_thread_pool(self) -> None:
+        """
+        Size AnyIO's default thread limiter, which runs sync route handlers and
+        dependencies. Must be called from within the event loop.
+        """
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        limiter.total_tokens = settings.THREAD_POOL_SIZE
+
+    def render(self) -> str:
+        """
+        Render the admission and thread-pool gauges and counters in the
+        Prometheus text exposition format.
+        """
+        gauges = {
+            "admission_active_requests": ("Requests being handled.", "active"),
+            "admission_queued_requests": ("Requests waiting for a slot.", "waiting"),
+            "admission_concurrency_limit": ("Concurrent request limit.", "concurrency"),
+        }
+        lines = []
+        for metric, (description, attribute) in gauges.items():
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} gauge"]
+            for name, limiter in sorted(self.limiters.items()):
+                value = getattr(limiter, attribute)
+                lines.append(f"{metric}{{{_labels(router=name)}}} {value}")
+
+        lines += [
+            "# HELP admission_requests_total Requests by router and outcome.",
+            "# TYPE admission_requests_total counter",
+        ]
+        for name, limiter in sorted(self.limiters.items()):
+            for outcome, count in (
+                ("admitted", limiter.admitted),
+                ("rejected_queue_full", limiter.rejected_full),
+                ("rejected_timeout", limiter.rejected_timeout),
+            ):
+                labels = _labels(router=name, outcome=outcome)
+                lines.append(f"admission_requests_total{{{labels}}} {count}")
+
+        try:
+            threads = anyio.to_thread.current_default_thread_limiter()
+        except RuntimeError:
+            # No event loop, e.g. when rendered from a script
+            return "\n".join(lines) + "\n"
+        statistics = threads.statistics()
+        lines += [
+            "# HELP thread_pool_limit Threads available to sync handlers.",
+            "# TYPE thread_pool_limit gauge",
+            f"thread_pool_limit {statistics.total_tokens}",
+            "# HELP thread_pool_busy Threads running sync handlers.",
+            "# TYPE thread_pool_busy gauge",
+            f"thread_pool_busy {statistics.borrowed_tokens}",
+            "# HELP thread_pool_queued Calls waiting for a thread.",
+            "# TYPE thread_pool_queued gauge",
+            f"thread_pool_queued {statistics.tasks_waiting}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+admission_control = AdmissionControl()
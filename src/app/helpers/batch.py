@@ -0,0 +1,21 @@
+from fastapi import HTTPException
+
+# Upper bound of ids per multi-get request, keeps the IN list and response small
+MAX_BATCH_IDS = 100
+
+
+def parse_ids(ids: str) -> list[int]:
+    """
+    Parse a comma separated id list, dropping repeated ids but keeping the order.
+    :raises HTTPException 400 when an id is not an integer or there are too many
+    """
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be integers")
+    unique = list(dict.fromkeys(parsed))
+    if not unique or len(unique) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"Give between 1 and {MAX_BATCH_IDS} ids"
+        )
+    return unique
@@ -0,0 +1,88 @@
+from typing import Any, Generic, TypeVar
+
+from cachetools import TTLCache
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .config import settings
+from .replicas import PINNED
+from src.app.schemas.models import Post, User
+
+T = TypeVar("T")
+
+
+class _CountingTTLCache(TTLCache):  # type: ignore[type-arg]
+    """
+    TTLCache evicts the least recently used entry through `popitem` when full.
+    """
+
+    evictions = 0
+
+    def popitem(self) -> tuple[Any, Any]:
+        item = super().popitem()
+        self.evictions += 1
+        return item  # type: ignore[no-any-return]
+
+
+def use_cache(session: AsyncSession) -> bool:
+    """
+    Sessions pinned to the primary after the client's own write skip cached
+    entries, which may have been read from a lagging replica.
+    """
+    return not session.info.get(PINNED, False)
+
+
+class EntityCache(Generic[T]):
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        """
+        Bounded LRU cache with a per entry time-to-live, keyed by primary key.
+        Entries are only as fresh as the TTL across processes, writes in this
+        process invalidate them immediately.
+        """
+        self.enabled = maxsize > 0
+        self._cache = _CountingTTLCache(maxsize=max(maxsize, 1), ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int) -> T | None:
+        value: T | None = self._cache.get(key) if self.enabled else None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get_many(self, keys: list[int]) -> dict[int, T]:
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key: int, value: T) -> None:
+        if self.enabled:
+            self._cache[key] = value
+
+    def invalidate(self, key: int) -> None:
+        self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize if self.enabled else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self._cache.evictions,
+        }
+
+
+post_cache: EntityCache[Post] = EntityCache(
+    settings.ENTITY_CACHE_SIZE, settings.ENTITY_CACHE_TTL_SECONDS
+)
+user_cache: EntityCache[User] = EntityCache(
+    settings.ENTITY_CACHE_SIZE, settings.ENTITY_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from fastapi import HTTPException
+
+
+def make_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def validator_headers(version: int, updated_at: datetime) -> dict[str, str]:
+    """
+    Build the `ETag` and `Last-Modified` headers for a row version.
+    """
+    if updated_at.tzinfo is None:
+        # SQLite drops the timezone, the values are always stored in UTC
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return {
+        "ETag": make_etag(version),
+        "Last-Modified": format_datetime(updated_at.astimezone(timezone.utc), True),
+    }
+
+
+def none_match_hit(if_none_match: str, version: int) -> bool:
+    """
+    Whether an `If-None-Match` header matches the current version, using the weak
+    comparison RFC 9110 prescribes for it.
+    """
+    etag = make_etag(version)
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag in (etag, "*"):
+            return True
+    return False
+
+
+def parse_if_match(if_match: str | None) -> int | None:
+    """
+    Return the version an `If-Match` header requires, or None when any existing
+    version will do.
+
+    :raises HTTPException 412 when the header is not an ETag this API produced
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip()
+    if tag.startswith('"') and tag.endswith('"') and tag[1:-1].isdigit():
+        return int(tag[1:-1])
+    raise HTTPException(status_code=412, detail="Precondition failed")
@@ -1,6 +1,7 @@
 from pydantic import AnyHttpUrl, Field, computed_field, PostgresDsn
 from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import cached_property
 from typing import Literal
 
 
@@ -36,32 +37,98 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     SCOPE_DESCRIPTION: str = "user_impersonation"
 
-    @computed_field
-    @property
+    # Connection pool settings, applied to both the sync and the async engine
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Optional read replicas, e.g. ["postgresql+psycopg://user:pw@replica1/db"].
+    # GET endpoints read from them round-robin, clients are pinned to the primary
+    # for a short while after their own writes
+    DB_REPLICA_URLS: list[str] = []
+    DB_REPLICA_HEALTH_CHECK_SECONDS: float = 10
+    DB_READ_YOUR_WRITES_SECONDS: int = 5
+
+    # Admission control per router: at most ADMISSION_CONCURRENCY requests run at
+    # once (default: DB_POOL_SIZE + DB_MAX_OVERFLOW), the next ones wait in a
+    # bounded queue and get a 503 with Retry-After when it is full or they time out
+    ADMISSION_CONCURRENCY: int | None = None
+    ADMISSION_QUEUE_SIZE: int = 100
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 5
+    ADMISSION_RETRY_AFTER_SECONDS: float = 1
+    # Threads available to sync route handlers and dependencies, AnyIO's default
+    # is 40
+    THREAD_POOL_SIZE: int = 40
+
+    # Outbound HTTP client settings, shared by all identity and Graph calls
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60
+    HTTP_CONNECT_TIMEOUT: float = 5
+    HTTP_TIMEOUT: float = 15
+    HTTP2: bool = False
+
+    # OpenID config and signing keys are refreshed in the background, with jitter
+    OPENID_REFRESH_SECONDS: int = 3600
+    OPENID_RETRY_SECONDS: int = 60
+    # A token signed with an unknown `kid` triggers at most one refresh per interval
+    OPENID_UNKNOWN_KID_REFRESH_SECONDS: int = 300
+
+    # Allowed tenants are reloaded from the database in the background, unknown
+    # tenants are remembered briefly so bad tokens don't query the table each time
+    TENANT_REFRESH_SECONDS: int = 300
+    TENANT_NEGATIVE_CACHE_SIZE: int = 10000
+    TENANT_NEGATIVE_CACHE_SECONDS: int = 30
+
+    # Readiness probes reuse the last database ping for this long
+    HEALTH_CACHE_SECONDS: float = 5
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2
+
+    # Statements slower than this are logged and their plan captured, at most
+    # once per interval per statement
+    SLOW_QUERY_THRESHOLD_MS: float = 200
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: int = 300
+    SLOW_QUERY_MAX_STATEMENTS: int = 1000
+
+    # Verified bearer tokens cached per auth scheme until they expire
+    TOKEN_CACHE_SIZE: int = 4096
+
+    # On-Behalf-Of token cache, tokens are dropped this long before they expire
+    OBO_CACHE_SIZE: int = 1024
+    OBO_EXPIRY_SKEW_SECONDS: int = 60
+
+    # Entity cache settings, a size of 0 disables the cache
+    ENTITY_CACHE_SIZE: int = 1024
+    ENTITY_CACHE_TTL_SECONDS: int = 60
+
+    # Derived settings are computed once per Settings instance, they are read on
+    # every request by the auth schemes
+    @computed_field  # type: ignore[misc]
+    @cached_property
     def SCOPE_NAME(self) -> str:
-        scope_name = f'api://{self.APP_CLIENT_ID}/{self.SCOPE_DESCRIPTION}'
-        print(scope_name)
-        return scope_name
+        return f'api://{self.APP_CLIENT_ID}/{self.SCOPE_DESCRIPTION}'
 
-    @computed_field
-    @property
+    @computed_field  # type: ignore[misc]
+    @cached_property
     def SCOPES(self) -> dict[str, str]:
         return {
             self.SCOPE_NAME: self.SCOPE_DESCRIPTION,
         }
 
-    @computed_field
-    @property
+    @computed_field  # type: ignore[misc]
+    @cached_property
     def OPENAPI_AUTHORIZATION_URL(self) -> str:
         return f"https://login.microsoftonline.com/{self.TENANT_ID}/oauth2/v2.0/authorize"
 
-    @computed_field
-    @property
+    @computed_field  # type: ignore[misc]
+    @cached_property
     def OPENAPI_TOKEN_URL(self) -> str:
         return f"https://login.microsoftonline.com/{self.TENANT_ID}/oauth2/v2.0/token"
 
     @computed_field  # type: ignore[misc]
-    @property
+    @cached_property
     def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
         return MultiHostUrl.build(
             scheme="postgresql+psycopg",
@@ -1,13 +1,67 @@
 import logging
+from functools import cache
 
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlmodel import create_engine, Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .config import settings
+from .pool import TimedAsyncAdaptedQueuePool, TimedQueuePool, pool_options
+from .query_log import slow_query_log
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+# Engines are created on first use rather than at import, the app lifespan
+# creates them at startup so the first request doesn't pay for it
+@cache
+def get_engine() -> Engine:
+    engine = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        poolclass=TimedQueuePool,
+        **pool_options(),
+    )
+    slow_query_log.instrument(engine)
+    return engine
+
+
+# The postgresql+psycopg URL resolves to psycopg's async driver when used with
+# create_async_engine, so both engines share the same connection settings.
+@cache
+def get_async_engine() -> AsyncEngine:
+    engine = create_async_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        poolclass=TimedAsyncAdaptedQueuePool,
+        **pool_options(),
+    )
+    slow_query_log.instrument(engine.sync_engine, explain_engine=engine)
+    return engine
+
+
+@cache
+def get_replica_engines() -> tuple[AsyncEngine, ...]:
+    engines = []
+    for url in settings.DB_REPLICA_URLS:
+        engine = create_async_engine(
+            url, poolclass=TimedAsyncAdaptedQueuePool, **pool_options()
+        )
+        slow_query_log.instrument(engine.sync_engine, explain_engine=engine)
+        engines.append(engine)
+    return tuple(engines)
+
+
+# expire_on_commit=False so returned ORM objects can still be serialized after
+# commit without triggering an implicit (and forbidden) lazy load under asyncio
+@cache
+def get_async_session_factory() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        get_async_engine(), class_=AsyncSession, expire_on_commit=False
+    )
+
+
+def new_async_session() -> AsyncSession:
+    return get_async_session_factory()()
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
@@ -21,4 +75,4 @@ def init_db(session: Session) -> None:
     # the tables un-commenting the next lines
     logger.info("Creating all tables")
     # This works because the models are already imported and registered from app.models
-    SQLModel.metadata.create_all(engine)
+    SQLModel.metadata.create_all(get_engine())
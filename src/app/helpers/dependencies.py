@@ -1,27 +1,142 @@
+import hashlib
 import logging
+import time
 
-from datetime import datetime, timedelta
-from typing import Annotated, Optional, Union
+from typing import Annotated, Any, Optional, Union
+from cachetools import TLRUCache
 from sqlmodel import Session
-from fastapi import Depends
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import SecurityScopes
 from fastapi.security.api_key import APIKeyHeader
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 from fastapi_azure_auth.exceptions import InvalidAuth
+from fastapi_azure_auth.openid_config import OpenIdConfig
 from fastapi_azure_auth.user import User
 from fastapi_azure_auth import (
     B2CMultiTenantAuthorizationCodeBearer,
     MultiTenantAzureAuthorizationCodeBearer,
     SingleTenantAzureAuthorizationCodeBearer,
 )
+from jose import jwt
+from jose.exceptions import JWTError
 
-from .db import engine
+from .db import get_engine, new_async_session
 from .config import settings
+from .http import HTTPClientRegistry, http_clients
+from .openid import SharedOpenIdConfig, openid_key_store
+from .replicas import PIN_COOKIE, replica_router
+from .tenants import tenant_registry
 
 
 log = logging.getLogger(__name__)
 
 
-azure_scheme = SingleTenantAzureAuthorizationCodeBearer(
+class VerifiedTokenCacheMixin:
+    """
+    Caches the `User` of a bearer token that passed validation, keyed by a hash of
+    the token, until the token's `exp`. Repeat requests with the same token then
+    skip parsing and verifying the RS256 signature.
+
+    Only the route's required scopes are checked again on a hit, everything else
+    the scheme validates is a property of the token itself.
+    """
+
+    auto_error: bool
+    oauth: Any
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.verified_tokens: TLRUCache = TLRUCache(  # type: ignore[type-arg]
+            maxsize=settings.TOKEN_CACHE_SIZE,
+            ttu=lambda _key, user, _now: user.exp,
+            timer=time.time,
+        )
+
+    async def __call__(
+        self, request: Request, security_scopes: SecurityScopes
+    ) -> Optional[User]:
+        try:
+            access_token = await self.oauth(request=request)
+        except HTTPException:
+            if not self.auto_error:
+                return None
+            raise
+
+        key = hashlib.sha256(access_token.encode()).digest()
+        user: Optional[User] = self.verified_tokens.get(key)
+        if user is None:
+            validate = super().__call__  # type: ignore[misc]
+            user = await validate(request, security_scopes)
+            if user is not None:
+                self.verified_tokens[key] = user
+            return user
+
+        if any(scope not in user.scp for scope in security_scopes.scopes):
+            if not self.auto_error:
+                return None
+            raise InvalidAuth("Required scope missing")
+        request.state.user = user
+        return user
+
+
+class SharedOpenIdConfigMixin:
+    """
+    Swaps the scheme's own `OpenIdConfig` for the one shared through
+    `openid_key_store`, so every scheme using the same config URL validates with
+    the same background refreshed signing keys.
+
+    A token signed with a key we don't know yet triggers a rate limited refresh
+    before validation, which picks up rotated keys without waiting for the next
+    scheduled refresh.
+    """
+
+    openid_config: OpenIdConfig
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.openid_config = openid_key_store.shared(self.openid_config)
+
+    async def __call__(
+        self, request: Request, security_scopes: SecurityScopes
+    ) -> Optional[User]:
+        _, _, token = request.headers.get("Authorization", "").partition(" ")
+        if token:
+            try:
+                kid = jwt.get_unverified_header(token).get("kid")
+            except JWTError:
+                kid = None  # Malformed tokens are reported by the scheme itself
+            if kid and isinstance(self.openid_config, SharedOpenIdConfig):
+                await self.openid_config.refresh_for_kid(kid)
+        validate = super().__call__  # type: ignore[misc]
+        return await validate(request, security_scopes)
+
+
+class CachedSingleTenantAzureAuthorizationCodeBearer(
+    VerifiedTokenCacheMixin,
+    SharedOpenIdConfigMixin,
+    SingleTenantAzureAuthorizationCodeBearer,
+):
+    pass
+
+
+class CachedMultiTenantAzureAuthorizationCodeBearer(
+    VerifiedTokenCacheMixin,
+    SharedOpenIdConfigMixin,
+    MultiTenantAzureAuthorizationCodeBearer,
+):
+    pass
+
+
+class CachedB2CMultiTenantAuthorizationCodeBearer(
+    VerifiedTokenCacheMixin,
+    SharedOpenIdConfigMixin,
+    B2CMultiTenantAuthorizationCodeBearer,
+):
+    pass
+
+
+azure_scheme = CachedSingleTenantAzureAuthorizationCodeBearer(
     app_client_id=settings.APP_CLIENT_ID,
     scopes={
         f"api://{settings.APP_CLIENT_ID}/user_impersonation": "**No client secret needed, leave blank**"
@@ -31,13 +146,41 @@ azure_scheme = SingleTenantAzureAuthorizationCodeBearer(
 
 
 def get_db() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         yield session
 
 
 SessionDep = Annotated[Session, Depends(get_db)]
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with new_async_session() as session:
+        yield session
+
+
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for read-only handlers, on a read replica unless the client wrote
+    recently or no replica is available.
+    """
+    pinned = PIN_COOKIE in request.cookies
+    async with replica_router.session(pinned=pinned) as session:
+        yield session
+
+
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_db)]
+
+
+def get_http_clients() -> HTTPClientRegistry:
+    return http_clients
+
+
+HTTPClientsDep = Annotated[HTTPClientRegistry, Depends(get_http_clients)]
+
+
 async def validate_is_admin_user(user: User = Depends(azure_scheme)) -> None:
     """
     Validate that a user is in the `AdminUser` role in order to access the API.
@@ -47,49 +190,17 @@ async def validate_is_admin_user(user: User = Depends(azure_scheme)) -> None:
         raise InvalidAuth("User is not an AdminUser")
 
 
-class IssuerFetcher:
-    def __init__(self) -> None:
-        """
-        Example class for multi tenant apps, that caches issuers for an hour
-        """
-        self.tid_to_iss: dict[str, str] = {}
-        self._config_timestamp: Optional[datetime] = None
-
-    async def __call__(self, tid: str) -> str:
-        """
-        Check if memory cache needs to be updated or not, and then returns an issuer for a given tenant
-        :raises InvalidAuth when it's not a valid tenant
-        """
-        refresh_time = datetime.now() - timedelta(hours=1)
-        if not self._config_timestamp or self._config_timestamp < refresh_time:
-            self._config_timestamp = datetime.now()
-            # logic to find your allowed tenants and it's issuers here
-            # (This example cache in memory for 1 hour)
-            self.tid_to_iss = {
-                "intility_tenant_id": "https://login.microsoftonline.com/intility_tenant/v2.0",
-            }
-        try:
-            return self.tid_to_iss[tid]
-        except Exception as error:
-            log.exception("`iss` not found for `tid` %s. Error %s", tid, error)
-            raise InvalidAuth(
-                "You must be an Intility customer to access this resource"
-            )
-
-
-issuer_fetcher = IssuerFetcher()
-
-azure_scheme_auto_error_false = MultiTenantAzureAuthorizationCodeBearer(
+azure_scheme_auto_error_false = CachedMultiTenantAzureAuthorizationCodeBearer(
     app_client_id=settings.APP_CLIENT_ID,
     scopes={
         f"api://{settings.APP_CLIENT_ID}/user_impersonation": "User impersonation",
     },
     validate_iss=True,
-    iss_callable=issuer_fetcher,
+    iss_callable=tenant_registry,
     auto_error=False,
 )
 
-azure_scheme_auto_error_false_b2c = B2CMultiTenantAuthorizationCodeBearer(
+azure_scheme_auto_error_false_b2c = CachedB2CMultiTenantAuthorizationCodeBearer(
     app_client_id=settings.APP_CLIENT_ID,
     openapi_authorization_url=str(settings.AUTH_URL),
     openapi_token_url=str(settings.TOKEN_URL),
@@ -98,7 +209,7 @@ azure_scheme_auto_error_false_b2c = B2CMultiTenantAuthorizationCodeBearer(
         f"api://{settings.APP_CLIENT_ID}/user_impersonation": "User impersonation",
     },
     validate_iss=True,
-    iss_callable=issuer_fetcher,
+    iss_callable=tenant_registry,
     auto_error=False,
 )
 
@@ -0,0 +1,54 @@
+import asyncio
+import time
+from typing import Any
+
+from sqlalchemy import text
+
+from .config import settings
+from .db import get_async_engine
+from .openid import openid_key_store
+
+
+async def ping_database() -> None:
+    """
+    Run `SELECT 1` on a pooled connection, raises when the database is unreachable
+    or doesn't answer within `HEALTH_CHECK_TIMEOUT_SECONDS`.
+    """
+    async with asyncio.timeout(settings.HEALTH_CHECK_TIMEOUT_SECONDS):
+        async with get_async_engine().connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+
+class ReadinessCheck:
+    def __init__(self, ttl: float) -> None:
+        """
+        Caches the outcome of the database ping and the OpenID config status for
+        `ttl` seconds. However often probes arrive, the database sees at most one
+        ping per `ttl`, and concurrent probes share the ping in progress.
+        """
+        self.ttl = ttl
+        self._result: dict[str, Any] | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def status(self) -> dict[str, Any]:
+        if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._result
+        async with self._lock:
+            if self._result is None or time.monotonic() - self._checked_at >= self.ttl:
+                self._result = await self._check()
+                self._checked_at = time.monotonic()
+        return self._result
+
+    async def _check(self) -> dict[str, Any]:
+        try:
+            await ping_database()
+            database = True
+        except Exception:
+            database = False
+        # The keys are refreshed in the background, readiness only needs them loaded
+        openid = openid_key_store.ready
+        return {"ready": database and openid, "database": database, "openid": openid}
+
+
+readiness = ReadinessCheck(settings.HEALTH_CACHE_SECONDS)
@@ -0,0 +1,58 @@
+import importlib.util
+import logging
+
+import httpx
+
+from .config import settings
+
+log = logging.getLogger(__name__)
+
+# One pool per upstream so slow Graph calls can't starve token requests
+CLIENT_NAMES = ("identity", "graph")
+
+
+class HTTPClientRegistry:
+    def __init__(self) -> None:
+        """
+        Application scoped httpx clients, opened in the app lifespan and shared
+        by all requests so TCP connections and TLS sessions are reused.
+        """
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def open(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        """
+        Create the clients. `transport` replaces the network, e.g. with an
+        `httpx.MockTransport` when testing.
+        """
+        http2 = settings.HTTP2
+        if http2 and importlib.util.find_spec("h2") is None:
+            log.warning("HTTP2 is enabled but h2 is not installed, using HTTP/1.1")
+            http2 = False
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT
+        )
+        for name in CLIENT_NAMES:
+            self._clients[name] = httpx.AsyncClient(
+                limits=limits, timeout=timeout, http2=http2, transport=transport
+            )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        try:
+            return self._clients[name]
+        except KeyError:
+            raise RuntimeError(
+                f"HTTP client {name!r} is not open, it is created in the app lifespan"
+            )
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+http_clients = HTTPClientRegistry()
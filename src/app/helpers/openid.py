@@ -0,0 +1,168 @@
+import asyncio
+import contextlib
+import logging
+import random
+import time
+from datetime import datetime
+
+import httpx
+from fastapi import HTTPException, status
+from fastapi_azure_auth.openid_config import OpenIdConfig
+
+from .config import settings
+
+log = logging.getLogger(__name__)
+
+
+class SharedOpenIdConfig(OpenIdConfig):
+    def __init__(self, **kwargs: object) -> None:
+        """
+        OpenIdConfig that is refreshed by `OpenIdKeyStore` instead of in the request
+        path. A refresh swaps in new keys only when it succeeds, so requests keep
+        being served with the previous keys while it runs or when it fails.
+        """
+        super().__init__(**kwargs)  # type: ignore[arg-type]
+        self.signing_keys = {}
+        self.client: httpx.AsyncClient | None = None
+        self._refresh_lock = asyncio.Lock()
+        self._last_kid_refresh = 0.0
+
+    @property
+    def url(self) -> str:
+        path = 'common' if self.multi_tenant else self.tenant_id
+        if self.config_url:
+            url = self.config_url
+        elif self.token_version == 2:
+            url = f'https://login.microsoftonline.com/{path}/v2.0/.well-known/openid-configuration'
+        else:
+            url = f'https://login.microsoftonline.com/{path}/.well-known/openid-configuration'
+        if self.app_id:
+            url += f'?appid={self.app_id}'
+        return url
+
+    @property
+    def loaded(self) -> bool:
+        return self._config_timestamp is not None
+
+    async def load_config(self) -> None:
+        """
+        Called by the auth schemes on every request, only waits for the network
+        when no config was ever loaded.
+        """
+        if not self.loaded and not await self.refresh():
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='Connection to Azure AD is down. Unable to fetch provider configuration',
+                headers={'WWW-Authenticate': 'Bearer'},
+            )
+
+    async def refresh(self) -> bool:
+        """
+        Fetch the config and signing keys. Callers arriving while a refresh runs
+        wait for that one instead of starting another.
+        """
+        if self._refresh_lock.locked():
+            async with self._refresh_lock:
+                return self.loaded
+        async with self._refresh_lock:
+            try:
+                if self.client is not None:
+                    await self._fetch(self.client)
+                else:
+                    async with httpx.AsyncClient(timeout=10) as client:
+                        await self._fetch(client)
+            except Exception as error:
+                log.warning(
+                    'Unable to refresh OpenID config from %s: %s', self.url, error
+                )
+                return False
+            self._config_timestamp = datetime.now()
+            return True
+
+    async def refresh_for_kid(self, kid: str) -> None:
+        """
+        Refresh when a token names a key we don't know, at most once per interval
+        so tokens with made up `kid`s can't hammer the identity provider.
+        """
+        if not self.loaded or kid in self.signing_keys:
+            return
+        now = time.monotonic()
+        if now - self._last_kid_refresh < settings.OPENID_UNKNOWN_KID_REFRESH_SECONDS:
+            return
+        self._last_kid_refresh = now
+        log.info('Unknown signing key %s, refreshing OpenID config', kid)
+        await self.refresh()
+
+    async def _fetch(self, client: httpx.AsyncClient) -> None:
+        openid_response = await client.get(self.url)
+        openid_response.raise_for_status()
+        openid_cfg = openid_response.json()
+        jwks_response = await client.get(openid_cfg['jwks_uri'])
+        jwks_response.raise_for_status()
+        keys = jwks_response.json()['keys']
+
+        # No awaits from here on, requests never observe a half updated config
+        self.authorization_endpoint = openid_cfg['authorization_endpoint']
+        self.token_endpoint = openid_cfg['token_endpoint']
+        self.issuer = openid_cfg['issuer']
+        self._load_keys(keys)
+
+
+class OpenIdKeyStore:
+    def __init__(self) -> None:
+        """
+        One OpenID config per config URL, shared by every auth scheme using that
+        URL and refreshed by a single background task.
+        """
+        self._configs: dict[str, SharedOpenIdConfig] = {}
+        self._task: asyncio.Task[None] | None = None
+
+    def shared(self, config: OpenIdConfig) -> SharedOpenIdConfig:
+        candidate = SharedOpenIdConfig(
+            tenant_id=config.tenant_id,
+            multi_tenant=config.multi_tenant,
+            token_version=config.token_version,
+            app_id=config.app_id,
+            config_url=config.config_url,
+        )
+        return self._configs.setdefault(candidate.url, candidate)
+
+    @property
+    def ready(self) -> bool:
+        return all(config.loaded for config in self._configs.values())
+
+    def start(self, client: httpx.AsyncClient | None = None) -> None:
+        """
+        Start refreshing in the background. Startup doesn't wait for the first
+        load, the first authenticated requests do if it hasn't finished yet.
+        """
+        for config in self._configs.values():
+            config.client = client
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        for config in self._configs.values():
+            config.client = None
+
+    async def refresh_all(self) -> bool:
+        configs = list(self._configs.values())
+        results = await asyncio.gather(*(config.refresh() for config in configs))
+        return all(results)
+
+    async def _run(self) -> None:
+        while True:
+            succeeded = await self.refresh_all()
+            if succeeded:
+                delay = settings.OPENID_REFRESH_SECONDS
+            else:
+                delay = settings.OPENID_RETRY_SECONDS
+            # Jitter so replicas started together don't refresh in lockstep
+            await asyncio.sleep(delay * random.uniform(0.9, 1.1))
+
+
+openid_key_store = OpenIdKeyStore()
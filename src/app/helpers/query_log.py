@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .config import settings
+
+log = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN lists and multi-row VALUES get numbered parameter names,
+# e.g. %(id_1_1)s, %(title__0)s
+_NUMBERED_PARAMETER = re.compile(r"%\((\w+?)(?:_+\d+)+\)s")
+_ROW = r"\((?:[^()]|\(\w+\))*\)"
+_REPEATED_ROWS = re.compile(rf"(VALUES {_ROW})(?:, {_ROW})+")
+_PARAMETER_LIST = re.compile(
+    r"IN \((?:(?:%\(\w+\)s|\?)\s*,\s*)+(?:%\(\w+\)s|\?)\)"
+)
+
+
+def normalize(statement: str) -> str:
+    """
+    Reduce a statement to its shape, so IN lists and multi-row inserts of any
+    length are counted as one statement.
+    """
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _NUMBERED_PARAMETER.sub(r"%(\1)s", normalized)
+    normalized = _REPEATED_ROWS.sub(r"\1, ...", normalized)
+    return _PARAMETER_LIST.sub("IN (...)", normalized)
+
+
+class StatementStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+        self.slow_calls = 0
+        self.plan: str | None = None
+        self.plan_captured_at: float | None = None
+        self.last_explain_attempt = float("-inf")
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, max_statements: int) -> None:
+        """
+        Times every statement executed on the instrumented engines, per normalized
+        statement. Statements slower than `threshold_ms` have their plan captured
+        with `EXPLAIN (ANALYZE off)` in a background task, at most once per
+        `SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS` per statement.
+
+        At most `max_statements` distinct statements are tracked, later ones are
+        only counted in `untracked`.
+        """
+        self.threshold = threshold_ms / 1000
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._statements: dict[str, StatementStats] = {}
+        self._explaining: set[str] = set()
+        self._explain_tasks: set[asyncio.Task[None]] = set()
+        self.untracked = 0
+
+    def instrument(
+        self, engine: Engine, explain_engine: AsyncEngine | None = None
+    ) -> None:
+        """
+        Listen to `engine`'s cursor executions. Slow statements are explained on
+        `explain_engine` when given, which must be on the same database.
+        """
+
+        def before_cursor_execute(
+            conn: Any,
+            cursor: Any,
+            statement: str,
+            parameters: Any,
+            context: Any,
+            executemany: bool,
+        ) -> None:
+            context.query_start_time = time.perf_counter()
+
+        def after_cursor_execute(
+            conn: Any,
+            cursor: Any,
+            statement: str,
+            parameters: Any,
+            context: Any,
+            executemany: bool,
+        ) -> None:
+            elapsed = time.perf_counter() - context.query_start_time
+            key = self.record(statement, elapsed)
+            if (
+                key is not None
+                and explain_engine is not None
+                and not executemany
+                and conn.dialect.name == "postgresql"
+            ):
+                self._schedule_explain(key, statement, parameters, explain_engine)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    def record(self, statement: str, elapsed: float) -> str | None:
+        """
+        Add a timing, returns the normalized statement when it was slow and its
+        plan is due to be captured.
+        """
+        if statement.startswith("EXPLAIN"):
+            return None
+        key = normalize(statement)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                if len(self._statements) >= self.max_statements:
+                    self.untracked += 1
+                    return None
+                stats = self._statements[key] = StatementStats()
+            stats.calls += 1
+            stats.seconds_total += elapsed
+            stats.seconds_max = max(stats.seconds_max, elapsed)
+            if elapsed < self.threshold:
+                return None
+            stats.slow_calls += 1
+            now = time.monotonic()
+            interval = settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+            if key in self._explaining or now - stats.last_explain_attempt < interval:
+                return None
+            stats.last_explain_attempt = now
+            self._explaining.add(key)
+        log.warning("Slow query (%.1f ms): %s", elapsed * 1000, key)
+        return key
+
+    def _schedule_explain(
+        self, key: str, statement: str, parameters: Any, engine: AsyncEngine
+    ) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not running under the event loop, e.g. the sync engine in a script
+            with self._lock:
+                self._explaining.discard(key)
+            return
+        # Keep a reference until done, the loop itself only holds a weak one
+        task = loop.create_task(self._explain(key, statement, parameters, engine))
+        self._explain_tasks.add(task)
+        task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain(
+        self, key: str, statement: str, parameters: Any, engine: AsyncEngine
+    ) -> None:
+        try:
+            async with engine.connect() as connection:
+                result = await connection.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE off) {statement}", parameters
+                )
+                plan = "\n".join(row[0] for row in result)
+        except Exception as error:
+            plan = f"EXPLAIN failed: {error}"
+        with self._lock:
+            self._explaining.discard(key)
+            stats = self._statements[key]
+            stats.plan = plan
+            stats.plan_captured_at = time.time()
+
+    def top(self, limit: int, order_by: str = "total") -> list[dict[str, Any]]:
+        with self._lock:
+            rows = [
+                {
+                    "statement": key,
+                    "calls": stats.calls,
+                    "slow_calls": stats.slow_calls,
+                    "total_ms": round(stats.seconds_total * 1000, 3),
+                    "mean_ms": round(stats.seconds_total / stats.calls * 1000, 3),
+                    "max_ms": round(stats.seconds_max * 1000, 3),
+                    "plan": stats.plan,
+                    "plan_captured_at": stats.plan_captured_at,
+                }
+                for key, stats in self._statements.items()
+            ]
+        rows.sort(key=lambda row: row[f"{order_by}_ms"], reverse=True)
+        return rows[:limit]
+
+
+slow_query_log = SlowQueryLog(
+    settings.SLOW_QUERY_THRESHOLD_MS, settings.SLOW_QUERY_MAX_STATEMENTS
+)
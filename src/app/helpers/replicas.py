@@ -0,0 +1,145 @@
+import asyncio
+import contextlib
+import itertools
+import logging
+import random
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .db import get_replica_engines, new_async_session
+
+log = logging.getLogger(__name__)
+
+# Set on a client's responses to its own writes, for as long as it should read
+# from the primary
+PIN_COOKIE = "read_primary"
+
+# Sessions with this in `session.info` were pinned to the primary after a write.
+# They skip the entity caches, which may have been filled from a lagging replica
+PINNED = "pinned_to_primary"
+
+
+class ReplicaRouter:
+    def __init__(self) -> None:
+        """
+        Hands out sessions on the read replicas round-robin, skipping replicas
+        that failed their last health check, and on the primary when there are
+        none or none are healthy.
+        """
+        self._factories: list[async_sessionmaker[AsyncSession]] = []
+        self._engines: list[AsyncEngine] = []
+        self._healthy: list[bool] = []
+        self._turn = itertools.count()
+        self._task: asyncio.Task[None] | None = None
+        # Opens sessions on the primary, replaceable to point reads elsewhere
+        self.primary: Callable[[], AsyncSession] = new_async_session
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.DB_REPLICA_URLS)
+
+    def _load(self) -> None:
+        if not self._engines and self.enabled:
+            self._engines = list(get_replica_engines())
+            self._factories = [
+                async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+                for engine in self._engines
+            ]
+            # Assume healthy until the first check says otherwise
+            self._healthy = [True] * len(self._engines)
+
+    def session(self, *, pinned: bool = False) -> AsyncSession:
+        self._load()
+        healthy = [
+            factory
+            for factory, is_healthy in zip(self._factories, self._healthy)
+            if is_healthy
+        ]
+        if pinned or not healthy:
+            session = self.primary()
+            if pinned:
+                session.info[PINNED] = True
+            return session
+        return healthy[next(self._turn) % len(healthy)]()
+
+    def status(self) -> list[dict[str, Any]]:
+        return [
+            {"replica": index, "healthy": is_healthy}
+            for index, is_healthy in enumerate(self._healthy)
+        ]
+
+    async def check(self) -> None:
+        async def ping(engine: AsyncEngine) -> bool:
+            try:
+                async with asyncio.timeout(settings.HEALTH_CHECK_TIMEOUT_SECONDS):
+                    async with engine.connect() as connection:
+                        await connection.execute(text("SELECT 1"))
+                return True
+            except Exception as error:
+                log.warning("Read replica unavailable: %s", error)
+                return False
+
+        # Swap in the whole list so readers never see a partial update
+        self._healthy = list(await asyncio.gather(*map(ping, self._engines)))
+
+    def start(self) -> None:
+        self._load()
+        if self._engines:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(
+                settings.DB_REPLICA_HEALTH_CHECK_SECONDS * random.uniform(0.9, 1.1)
+            )
+
+
+replica_router = ReplicaRouter()
+
+
+class ReadYourWritesMiddleware:
+    """
+    Sets a short-lived cookie on successful responses to writes, so the client's
+    following reads go to the primary until replicas have caught up with them.
+    Does nothing when no replicas are configured.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] in ("GET", "HEAD", "OPTIONS")
+            or not replica_router.enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{PIN_COOKIE}=1; Max-Age={settings.DB_READ_YOUR_WRITES_SECONDS}; "
+                    # SameSite=None so it is also sent by the cross-site frontends
+                    "Path=/; HttpOnly; Secure; SameSite=None",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,51 @@
+from collections.abc import Mapping
+from typing import Any, TypeVar
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from src.app.schemas.models import (
+    Post,
+    PostsBatch,
+    PostsPublic,
+    User,
+    UserPostStats,
+    UsersBatch,
+    UsersPublic,
+    UserWithPosts,
+)
+
+T = TypeVar("T")
+
+# Built once at import, building an adapter compiles its pydantic-core schema
+post_adapter = TypeAdapter(Post)
+posts_public_adapter = TypeAdapter(PostsPublic)
+posts_batch_adapter = TypeAdapter(PostsBatch)
+user_adapter = TypeAdapter(User)
+user_stats_adapter = TypeAdapter(UserPostStats)
+user_with_posts_adapter = TypeAdapter(UserWithPosts)
+users_public_adapter = TypeAdapter(UsersPublic)
+users_batch_adapter = TypeAdapter(UsersBatch)
+
+
+class RawJSONResponse(Response):
+    media_type = "application/json"
+
+
+def fast_json(
+    adapter: TypeAdapter[T],
+    value: T,
+    *,
+    status_code: int = 200,
+    headers: Mapping[str, str] | None = None,
+) -> Any:
+    """
+    Serialize `value` straight to JSON bytes with pydantic-core.
+
+    Returning a Response makes FastAPI skip the `response_model` validation and
+    `jsonable_encoder` pass, which otherwise walks every ORM row a second time.
+    The `response_model` on the route still documents the schema.
+    """
+    return RawJSONResponse(
+        adapter.dump_json(value), status_code=status_code, headers=headers
+    )
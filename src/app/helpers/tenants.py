@@ -0,0 +1,88 @@
+import asyncio
+import contextlib
+import logging
+import random
+
+from cachetools import TTLCache
+from fastapi_azure_auth.exceptions import InvalidAuth
+from sqlmodel import select
+
+from .config import settings
+from .db import new_async_session
+from src.app.schemas.models import AllowedTenant
+
+log = logging.getLogger(__name__)
+
+
+class TenantRegistry:
+    def __init__(self) -> None:
+        """
+        Maps allowed tenant ids to their issuer, used as `iss_callable` by the
+        multi tenant auth schemes.
+
+        Requests only read `_issuers`, a background task reloads the table and
+        replaces the whole dict, so lookups never wait on a lock or the database.
+        A tenant missing from the dict is looked up once, and remembered as
+        unknown for `TENANT_NEGATIVE_CACHE_SECONDS` when it isn't found.
+        """
+        self._issuers: dict[str, str] = {}
+        self._unknown: TTLCache = TTLCache(  # type: ignore[type-arg]
+            maxsize=settings.TENANT_NEGATIVE_CACHE_SIZE,
+            ttl=settings.TENANT_NEGATIVE_CACHE_SECONDS,
+        )
+        self.loaded = False
+        self._task: asyncio.Task[None] | None = None
+
+    async def __call__(self, tid: str) -> str:
+        """
+        Return the issuer for a given tenant
+        :raises InvalidAuth when it's not a valid tenant
+        """
+        if (issuer := self._issuers.get(tid)) is not None:
+            return issuer
+        if tid not in self._unknown:
+            issuer = await self._lookup(tid)
+            if issuer is not None:
+                return issuer
+            log.warning("`iss` not found for `tid` %s", tid)
+            self._unknown[tid] = True
+        raise InvalidAuth("You must be an Intility customer to access this resource")
+
+    async def refresh(self) -> None:
+        async with new_async_session() as session:
+            tenants = (await session.exec(select(AllowedTenant))).all()
+        self._issuers = {tenant.tenant_id: tenant.issuer for tenant in tenants}
+        self.loaded = True
+
+    async def _lookup(self, tid: str) -> str | None:
+        async with new_async_session() as session:
+            tenant = await session.get(AllowedTenant, tid)
+        if tenant is None:
+            return None
+        # Copy and swap so concurrent readers never see the dict being resized
+        self._issuers = {**self._issuers, tenant.tenant_id: tenant.issuer}
+        return tenant.issuer
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as error:
+                log.warning("Unable to reload allowed tenants: %s", error)
+            # Jitter so replicas started together don't reload in lockstep
+            await asyncio.sleep(
+                settings.TENANT_REFRESH_SECONDS * random.uniform(0.9, 1.1)
+            )
+
+
+tenant_registry = TenantRegistry()
@@ -2,14 +2,14 @@ import logging
 
 from sqlmodel import Session
 
-from .helpers.db import engine, init_db
+from .helpers.db import get_engine, init_db
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 def init() -> None:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         init_db(session)
 
 
@@ -1,12 +1,25 @@
 import logging
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 from pydantic import BaseModel, Field
-from fastapi_azure_auth import SingleTenantAzureAuthorizationCodeBearer
-from fastapi import FastAPI, APIRouter, Security
+from fastapi import FastAPI, APIRouter, Depends, Security
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from .features.health import health_routes
 from .features.users import users_routes
 from .features.posts import posts_routes
+from .features.internal import internal_routes
+from .helpers.admission import admission_control
 from .helpers.config import settings
+from .helpers.db import get_async_engine
+from .helpers.dependencies import azure_scheme
+from .helpers.http import http_clients
+from .helpers.metrics import MetricsMiddleware, request_metrics
+from .helpers.openid import openid_key_store
+from .helpers.replicas import ReadYourWritesMiddleware, replica_router
+from .helpers.tenants import tenant_registry
 
 log = logging.getLogger(__name__)
 
@@ -22,7 +35,28 @@ def get_url() -> str:
     return f"postgresql+psycopg://{user}:{password}@{server}:{port}/{db}"
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    admission_control.configure_thread_pool()
+    http_clients.open()
+    print("Loading OpenID config in the background")
+    openid_key_store.start(http_clients.get("identity"))
+    tenant_registry.start()
+    replica_router.start()
+    # Create the engine and build the OpenAPI schema now instead of on the first
+    # request that needs them, FastAPI caches the schema on the app
+    get_async_engine()
+    app.openapi()
+    yield
+    await replica_router.stop()
+    await tenant_registry.stop()
+    await openid_key_store.stop()
+    await http_clients.aclose()
+    print("Application shutdown")
+
+
 app = FastAPI(
+    lifespan=lifespan,
     openapi_url=f"{settings.API_PREFIX}/openapi.json",
     swagger_ui_oauth2_redirect_url="/oauth2-redirect",
     swagger_ui_init_oauth={
@@ -35,12 +69,6 @@ app = FastAPI(
     title=settings.PROJECT_NAME,
 )
 
-azure_scheme = SingleTenantAzureAuthorizationCodeBearer(
-    app_client_id=settings.APP_CLIENT_ID,
-    tenant_id=settings.TENANT_ID,
-    scopes=settings.SCOPES,
-)
-
 # Define a list of origins that should be permitted to make cross-origin requests
 origins = [str(origin) for origin in settings.BACKEND_CORS_ORIGINS]
 prefix = settings.API_PREFIX
@@ -52,6 +80,8 @@ app.add_middleware(
     allow_methods=["*"],  # type: ignore
     allow_headers=["*"],  # type: ignore
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
 
 
 class User(BaseModel):
@@ -72,17 +102,6 @@ router = APIRouter(
 )
 
 
-@router.on_event("startup")  # type: ignore
-async def load_config() -> None:
-    print("Loading OpenID config on startup")
-    await azure_scheme.openid_config.load_config()
-
-
-@router.on_event("shutdown")  # type: ignore
-async def shutdown_event() -> None:
-    print("Application shutdown")
-
-
 @router.get(
     "/health", dependencies=[Security(azure_scheme, scopes=[USER_IMPERSONATION_SCOPE])]
 )
@@ -103,6 +122,28 @@ def make_user(user: User):
     return new_user
 
 
+# Served at the root without auth, as Prometheus scrapers expect
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        request_metrics.render() + admission_control.render(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 app.include_router(router)
-app.include_router(posts_routes.router, prefix=prefix, tags=["posts"])
-app.include_router(users_routes.router, prefix=prefix, tags=["users"])
+app.include_router(health_routes.router)
+# Health, metrics and internal routes stay reachable when the others shed load
+app.include_router(
+    posts_routes.router,
+    prefix=prefix,
+    tags=["posts"],
+    dependencies=[Depends(admission_control.limiter("posts"))],
+)
+app.include_router(
+    users_routes.router,
+    prefix=prefix,
+    tags=["users"],
+    dependencies=[Depends(admission_control.limiter("users"))],
+)
+app.include_router(internal_routes.router, prefix=prefix, tags=["internal"])
@@ -0,0 +1,43 @@
+import logging
+
+from sqlalchemy import case, delete, func, insert
+from sqlmodel import Session, select
+
+from .helpers.db import get_engine
+from .schemas.models import Post, User, UserPostStats
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def rebuild(session: Session) -> None:
+    # Recount every author from the posts table and replace the counters in a
+    # single transaction, so readers never see a half rebuilt table
+    counts = (
+        select(
+            User.id,
+            func.count(Post.id),
+            func.coalesce(func.sum(case((Post.published, 1), else_=0)), 0),
+        )
+        .select_from(User)
+        .outerjoin(Post, Post.author_id == User.id)  # type: ignore
+        .group_by(User.id)
+    )
+    session.execute(delete(UserPostStats))
+    session.execute(
+        insert(UserPostStats).from_select(
+            ["user_id", "post_count", "published_count"], counts
+        )
+    )
+    session.commit()
+
+
+def main() -> None:
+    logger.info("Rebuilding post counters")
+    with Session(get_engine()) as session:
+        rebuild(session)
+    logger.info("Post counters rebuilt")
+
+
+if __name__ == "__main__":
+    main()
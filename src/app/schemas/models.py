@@ -1,7 +1,14 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import DDL, Column, DateTime, Index, event
 from sqlmodel import Field, Relationship, SQLModel
 # from .database import engine
 
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 # Shared properties
 class UserBase(SQLModel):
     email: str = Field(max_length=254, unique=True)
@@ -12,6 +19,12 @@ class UserBase(SQLModel):
 class User(UserBase, table=True):
     __tablename__ = "Brukere"
     id: int | None = Field(default=None, primary_key=True)
+    # Bumped on every update, used for ETag and If-Match
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    updated_at: datetime = Field(
+        default_factory=utcnow,
+        sa_column=Column(DateTime(timezone=True), nullable=False, default=utcnow),
+    )
     posts: list["Post"] = Relationship(back_populates="author")
 
 
@@ -20,6 +33,12 @@ class UserCreate(UserBase):
     name: str
 
 
+# Partial update, only the fields that are sent are changed
+class UserUpdate(SQLModel):
+    email: str | None = Field(default=None, max_length=254)
+    name: str | None = None
+
+
 # Properties to return via API, id is always required
 class UserPublic(UserBase):
     id: int
@@ -35,21 +54,139 @@ class PostBase(SQLModel):
 # Database model, database table inferred from class name
 class Post(PostBase, table=True):
     __tablename__ = "Innlegg"
+    __table_args__ = (Index("ix_Innlegg_author_id_id", "author_id", "id"),)
     id: int | None = Field(default=None, primary_key=True)
     author_id: int | None = Field(
         default=None, foreign_key="Brukere.id", nullable=False
     )
+    # Bumped on every update, used for ETag and If-Match
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    updated_at: datetime = Field(
+        default_factory=utcnow,
+        sa_column=Column(DateTime(timezone=True), nullable=False, default=utcnow),
+    )
     author: User | None = Relationship(back_populates="posts")
 
 
+# Full-text search over title and content. Postgres keeps a generated, weighted
+# tsvector column with a GIN index (migration 7e2b9d4c1a86), SQLite gets an
+# external content FTS5 table kept in sync by triggers. The column is not mapped
+# on the model so it never shows up in responses. The same DDL runs when the
+# tables are created with `create_all`, e.g. by the benchmarks.
+SEARCH_CONFIG = "english"
+
+POSTGRES_SEARCH_DDL = (
+    'ALTER TABLE "Innlegg" ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ('
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')"
+    ") STORED",
+    'CREATE INDEX "ix_Innlegg_search_vector" ON "Innlegg" USING gin (search_vector)',
+)
+
+SQLITE_SEARCH_DDL = (
+    'CREATE VIRTUAL TABLE "Innlegg_fts" USING fts5('
+    "title, content, content='Innlegg', content_rowid='id')",
+    'CREATE TRIGGER "Innlegg_fts_insert" AFTER INSERT ON "Innlegg" BEGIN '
+    'INSERT INTO "Innlegg_fts"(rowid, title, content) '
+    "VALUES (new.id, new.title, new.content); END",
+    'CREATE TRIGGER "Innlegg_fts_delete" AFTER DELETE ON "Innlegg" BEGIN '
+    'INSERT INTO "Innlegg_fts"("Innlegg_fts", rowid, title, content) '
+    "VALUES ('delete', old.id, old.title, old.content); END",
+    'CREATE TRIGGER "Innlegg_fts_update" AFTER UPDATE OF title, content ON "Innlegg" '
+    'BEGIN INSERT INTO "Innlegg_fts"("Innlegg_fts", rowid, title, content) '
+    "VALUES ('delete', old.id, old.title, old.content); "
+    'INSERT INTO "Innlegg_fts"(rowid, title, content) '
+    "VALUES (new.id, new.title, new.content); END",
+)
+
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(
+        Post.__table__,  # type: ignore[attr-defined]
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(
+        Post.__table__,  # type: ignore[attr-defined]
+        "after_create",
+        DDL(statement).execute_if(dialect="sqlite"),
+    )
+event.listen(
+    Post.__table__,  # type: ignore[attr-defined]
+    "after_drop",
+    DDL('DROP TABLE IF EXISTS "Innlegg_fts"').execute_if(dialect="sqlite"),
+)
+
+
 class PostCreate(PostBase):
     title: str
     content: str
 
 
+# Partial update, only the fields that are sent are changed
+class PostUpdate(SQLModel):
+    title: str | None = None
+    content: str | None = None
+    published: bool | None = None
+
+
+# Per-author post counters, maintained by the posts services in the same
+# transaction as the post write so reads never need a COUNT(*)
+class UserPostStats(SQLModel, table=True):
+    __tablename__ = "Brukerstatistikk"
+    user_id: int = Field(foreign_key="Brukere.id", primary_key=True)
+    post_count: int = 0
+    published_count: int = 0
+
+
+# Tenants allowed to call the multi tenant endpoints, with the issuer their
+# tokens must carry
+class AllowedTenant(SQLModel, table=True):
+    __tablename__ = "Leietakere"
+    tenant_id: str = Field(max_length=64, primary_key=True)
+    issuer: str
+
+
 class PostsPublic(SQLModel):
     data: list[Post]
-    count: int
+    count: int | None = None
+    next_cursor: str | None = None
+
+
+# A user with their latest posts, when requested with `include=posts`. `posts`
+# is None when they were not requested
+class UserWithPosts(UserBase):
+    id: int
+    version: int
+    updated_at: datetime
+    posts: list[Post] | None = None
+
+
+class UsersPublic(SQLModel):
+    data: list[UserWithPosts]
+    next_cursor: str | None = None
+
+
+# Multi-get results, in the requested order, with the ids that don't exist
+class PostsBatch(SQLModel):
+    data: list[Post]
+    missing: list[int] = []
+
+
+class UsersBatch(SQLModel):
+    data: list[User]
+    missing: list[int] = []
+
+
+class BulkRowError(SQLModel):
+    index: int
+    detail: str
+
+
+# ids is aligned with the submitted rows, None where the row was not created
+class BulkCreateResult(SQLModel):
+    ids: list[int | None]
+    errors: list[BulkRowError] = []
 
 
 # SQLModel.metadata.create_all(bind=engine)
@@ -0,0 +1,92 @@
+"""
+Compare requests/sec of the sync (thread pool) and async database session paths.
+
+Both apps read the same post from the configured database, the sync one through
+``SessionDep`` in a ``def`` handler and the async one through the real posts router.
+
+Usage:
+    python -m src.benchmarks.db_sessions --post-id 1 --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any
+
+import httpx
+from fastapi import FastAPI
+from sqlmodel import select
+
+from src.app.features.posts import posts_routes
+from src.app.helpers.dependencies import SessionDep
+from src.app.schemas.models import Post
+
+
+def build_sync_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/posts/{post_id}", response_model=Post)
+    def read_post_by_id(session: SessionDep, post_id: int) -> Any:
+        return session.exec(select(Post).where(Post.id == post_id)).first()
+
+    return app
+
+
+def build_async_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(posts_routes.router)
+    return app
+
+
+async def run(app: FastAPI, path: str, total: int, concurrency: int) -> dict[str, Any]:
+    remaining = total
+    errors = 0
+
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+
+        async def worker() -> None:
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+
+        await client.get(path)  # warm up the pool before timing
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--post-id", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    path = f"/posts/{args.post_id}"
+    results = {
+        "sync": asyncio.run(
+            run(build_sync_app(), path, args.requests, args.concurrency)
+        ),
+        "async": asyncio.run(
+            run(build_async_app(), path, args.requests, args.concurrency)
+        ),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Runs the real app in-process against a benchmark database, with the database
+session and auth dependencies overridden, and seeds it through the bulk
+endpoints so the post counters are consistent.
+"""
+import os
+import tempfile
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import httpx
+from fastapi import FastAPI
+
+# Auth and the database are overridden, the remaining required settings only
+# need to exist for the app to import
+PLACEHOLDER_SETTINGS = (
+    "OPENAPI_CLIENT_ID",
+    "TENANT_ID",
+    "APP_CLIENT_ID",
+    "GRAPH_SECRET",
+    "CLIENT_SECRET",
+    "POSTGRES_SERVER",
+    "POSTGRES_USER",
+    "POSTGRES_PASSWORD",
+    "POSTGRES_DB",
+)
+
+
+class Seeded(NamedTuple):
+    user_ids: list[int]
+    post_ids: list[int]
+
+
+def sqlite_url(directory: str) -> str:
+    return f"sqlite+aiosqlite:///{Path(directory) / 'benchmark.db'}"
+
+
+def build_app(database_url: str) -> tuple[FastAPI, Any]:
+    """
+    Import the app with placeholder settings and route its sessions to an engine
+    for `database_url`. Returns the app and that engine.
+    """
+    for name in PLACEHOLDER_SETTINGS:
+        os.environ.setdefault(name, "benchmark")
+
+    from fastapi_azure_auth.user import User
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    from src.app.helpers import dependencies
+    from src.app.helpers.replicas import replica_router
+    from src.app.main import app
+
+    engine = create_async_engine(database_url)
+    session_factory = async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def get_benchmark_db() -> AsyncGenerator[AsyncSession, None]:
+        async with session_factory() as session:
+            yield session
+
+    def get_benchmark_user() -> User:
+        return User.model_construct(
+            claims={}, access_token="benchmark", roles=["AdminUser"], scp=[]
+        )
+
+    app.dependency_overrides[dependencies.get_async_db] = get_benchmark_db
+    # Read handlers and the export stream get their sessions from the router
+    replica_router.primary = session_factory
+    for scheme in (
+        dependencies.azure_scheme,
+        dependencies.azure_scheme_auto_error_false,
+        dependencies.azure_scheme_auto_error_false_b2c,
+    ):
+        app.dependency_overrides[scheme] = get_benchmark_user
+    return app, engine
+
+
+def reset_app_state() -> None:
+    from src.app.helpers.cache import post_cache, user_cache
+    from src.app.helpers.db import new_async_session
+    from src.app.helpers.replicas import replica_router
+
+    replica_router.primary = new_async_session
+    # Cached entities belong to the benchmark database, which is gone now
+    post_cache.clear()
+    user_cache.clear()
+
+
+async def create_tables(engine: Any) -> None:
+    """
+    Create the tables, refusing to touch a database that already has any of
+    them, since they are dropped again afterwards.
+    """
+    from sqlalchemy import inspect
+    from sqlmodel import SQLModel
+
+    def create(connection: Any) -> None:
+        existing = set(inspect(connection).get_table_names())
+        clashing = existing & set(SQLModel.metadata.tables)
+        if clashing:
+            raise RuntimeError(
+                f"Tables {sorted(clashing)} already exist, "
+                "point --database-url at an empty database"
+            )
+        SQLModel.metadata.create_all(connection)
+
+    async with engine.begin() as connection:
+        await connection.run_sync(create)
+
+
+async def drop_tables(engine: Any) -> None:
+    from sqlmodel import SQLModel
+
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.drop_all)
+
+
+async def seed(
+    client: httpx.AsyncClient, prefix: str, users: int, posts_per_user: int
+) -> Seeded:
+    response = await client.post(
+        f"{prefix}/users/bulk",
+        json=[
+            {"email": f"bench{index}@example.com", "name": f"Bench {index}"}
+            for index in range(users)
+        ],
+    )
+    response.raise_for_status()
+    user_ids = [user_id for user_id in response.json()["ids"] if user_id is not None]
+
+    post_ids: list[int] = []
+    for user_id in user_ids:
+        response = await client.post(
+            f"{prefix}/posts/bulk",
+            params={"author_id": user_id},
+            json=[
+                {
+                    "title": f"Post {index}",
+                    "content": "Lorem ipsum dolor sit amet " * 8,
+                    "published": index % 2 == 0,
+                }
+                for index in range(posts_per_user)
+            ],
+        )
+        response.raise_for_status()
+        post_ids.extend(post_id for post_id in response.json()["ids"] if post_id)
+    return Seeded(user_ids, post_ids)
+
+
+@asynccontextmanager
+async def benchmark_app(
+    database_url: str | None,
+) -> AsyncGenerator[tuple[FastAPI, httpx.AsyncClient, Any], None]:
+    """
+    Yield the app, a client bound to it and the engine its sessions use.
+    Without `database_url`, a SQLite database in a temporary directory is used,
+    which needs `aiosqlite`.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        app, engine = build_app(database_url or sqlite_url(directory))
+        await create_tables(engine)
+        try:
+            transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://benchmark"
+            ) as client:
+                yield app, client, engine
+        finally:
+            await drop_tables(engine)
+            await engine.dispose()
+            app.dependency_overrides.clear()
+            reset_app_state()
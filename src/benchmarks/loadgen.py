@@ -0,0 +1,106 @@
+"""
+A small async HTTP load generator: a fixed number of workers pick weighted
+operations at random and run them back to back, for a number of requests or a
+duration, recording the latency and outcome of each request per operation.
+"""
+import asyncio
+import math
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, NamedTuple
+
+import httpx
+
+# An operation issues one request and returns its response
+Operation = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+
+class WeightedOperation(NamedTuple):
+    weight: int
+    run: Operation
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not ordered:
+        return 0.0
+    rank = math.ceil(fraction * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "requests_per_second": round(len(ordered) / seconds, 1) if seconds else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 0.50) * 1000, 2),
+            "p95": round(percentile(ordered, 0.95) * 1000, 2),
+            "p99": round(percentile(ordered, 0.99) * 1000, 2),
+            "max": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        },
+    }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    operations: dict[str, WeightedOperation],
+    *,
+    concurrency: int,
+    requests: int | None = None,
+    duration: float | None = None,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """
+    Run `operations` on `concurrency` workers until `requests` requests were
+    sent or `duration` seconds passed, whichever is given. Responses with a 5xx
+    status, or requests that raise, count as errors.
+    """
+    if (requests is None) == (duration is None):
+        raise ValueError("Give exactly one of requests or duration")
+
+    names = list(operations)
+    weights = [operations[name].weight for name in names]
+    latencies: dict[str, list[float]] = {name: [] for name in names}
+    errors: dict[str, int] = dict.fromkeys(names, 0)
+    remaining = requests
+    deadline = None if duration is None else time.perf_counter() + duration
+
+    def more() -> bool:
+        nonlocal remaining
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        assert remaining is not None
+        remaining -= 1
+        return remaining >= 0
+
+    async def worker(index: int) -> None:
+        rng = random.Random(seed * 1_000_003 + index)
+        while more():
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await operations[name].run(client, rng)
+                failed = response.status_code >= 500
+            except httpx.HTTPError:
+                failed = True
+            latencies[name].append(time.perf_counter() - start)
+            errors[name] += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    everything = [latency for values in latencies.values() for latency in values]
+    return {
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "total": summarize(everything, sum(errors.values()), seconds),
+        "operations": {
+            name: summarize(latencies[name], errors[name], seconds) for name in names
+        },
+    }
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark of the per-item cost of serializing a page of posts.
+
+"before" runs FastAPI's own `response_model` path (validate, `jsonable_encoder`
+style serialization, `json.dumps`), "after" the pre-built TypeAdapter used by
+`fast_json`. No database is needed.
+
+Usage:
+    python -m src.benchmarks.serialization --items 100 --rounds 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from src.app.helpers.responses import posts_public_adapter
+from src.app.schemas.models import Post, PostsPublic
+
+
+def build_page(items: int) -> PostsPublic:
+    posts = [
+        Post(
+            id=index,
+            author_id=1,
+            title=f"Post number {index}",
+            content="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4,
+            published=index % 2 == 0,
+        )
+        for index in range(items)
+    ]
+    return PostsPublic(data=posts, count=items)
+
+
+async def time_response_model(page: PostsPublic, rounds: int) -> float:
+    field = create_response_field(name="Response_read_posts", type_=PostsPublic)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        content = await serialize_response(field=field, response_content=page)
+        JSONResponse(content).body
+    return time.perf_counter() - start
+
+
+def time_type_adapter(page: PostsPublic, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        posts_public_adapter.dump_json(page)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    page = build_page(args.items)
+    per_item = args.items * args.rounds
+    before = asyncio.run(time_response_model(page, args.rounds))
+    after = time_type_adapter(page, args.rounds)
+    results: dict[str, Any] = {
+        "items": args.items,
+        "rounds": args.rounds,
+        "before_us_per_item": round(before / per_item * 1e6, 3),
+        "after_us_per_item": round(after / per_item * 1e6, 3),
+        "speedup": round(before / after, 2),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
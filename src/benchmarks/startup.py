@@ -0,0 +1,78 @@
+"""
+Measure cold start: the time to import ``src.app.main``, run the app's startup
+lifespan and answer the first requests, each run in a fresh interpreter.
+
+The first request goes to an unauthenticated route and the second fetches the
+OpenAPI schema, which should be served from the schema built during startup.
+Background refreshes started by the lifespan may log connection errors when
+Entra ID or the database is unreachable, they don't affect the timings.
+Settings are read as usual.
+
+Usage:
+    python -m src.benchmarks.startup --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Any
+
+# Runs in the child interpreter, prints one JSON line of timings in milliseconds
+CHILD = """
+import asyncio, json, time
+start = time.perf_counter()
+from src.app.main import app, settings
+imported = time.perf_counter()
+
+import httpx
+
+async def first_responses():
+    timings = {"import_ms": (imported - start) * 1000}
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        timings["lifespan_startup_ms"] = (started - imported) * 1000
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://startup")
+        async with client:
+            response = await client.get(f"{settings.API_PREFIX}/hello/startup")
+            responded = time.perf_counter()
+            assert response.status_code == 200, response.status_code
+            timings["first_response_ms"] = (responded - started) * 1000
+            timings["time_to_first_response_ms"] = (responded - start) * 1000
+            response = await client.get(app.openapi_url)
+            assert response.status_code == 200, response.status_code
+            timings["openapi_response_ms"] = (time.perf_counter() - responded) * 1000
+    print(json.dumps(timings))
+
+asyncio.run(first_responses())
+"""
+
+
+def run_once() -> dict[str, float]:
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD], capture_output=True, text=True, check=True
+    )
+    timings: dict[str, float] = json.loads(completed.stdout.strip().splitlines()[-1])
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    results: dict[str, Any] = {"runs": args.runs}
+    for name in runs[0]:
+        values = sorted(run[name] for run in runs)
+        results[name] = {
+            "median": round(statistics.median(values), 2),
+            "min": round(values[0], 2),
+            "max": round(values[-1], 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
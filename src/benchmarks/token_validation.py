@@ -0,0 +1,106 @@
+"""
+Benchmark per-request CPU of bearer token validation, with and without the
+verified-token cache, for a token that is presented repeatedly.
+
+A local RSA key signs the token and is installed as the scheme's signing key,
+so no network access to Entra ID is needed. Settings are read as usual.
+
+Usage:
+    python -m src.benchmarks.token_validation --rounds 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Any
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.security import SecurityScopes
+from fastapi_azure_auth import SingleTenantAzureAuthorizationCodeBearer
+from jose import jwk, jwt
+from starlette.requests import Request
+
+from src.app.helpers.config import settings
+from src.app.helpers.dependencies import CachedSingleTenantAzureAuthorizationCodeBearer
+
+KID = "benchmark"
+ISSUER = f"https://login.microsoftonline.com/{settings.TENANT_ID}/v2.0"
+
+
+def signed_token() -> tuple[str, Any]:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    now = int(time.time())
+    claims = {
+        "aud": settings.APP_CLIENT_ID,
+        "iss": ISSUER,
+        "iat": now,
+        "nbf": now,
+        "exp": now + 3600,
+        "sub": "benchmark-user",
+        "tid": settings.TENANT_ID,
+        "scp": "user_impersonation",
+        "roles": ["AdminUser"],
+        "ver": "2.0",
+    }
+    token = jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": KID})
+    return token, jwk.construct(public_pem.decode(), "RS256")
+
+
+def prepare(scheme: SingleTenantAzureAuthorizationCodeBearer, key: Any) -> None:
+    scheme.openid_config.signing_keys = {KID: key}
+    scheme.openid_config.issuer = ISSUER
+    scheme.openid_config._config_timestamp = datetime.now()
+
+
+async def time_scheme(
+    scheme: SingleTenantAzureAuthorizationCodeBearer, token: str, rounds: int
+) -> float:
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+    scopes = SecurityScopes()
+    start = time.process_time()
+    for _ in range(rounds):
+        request = Request({"type": "http", "headers": headers})
+        await scheme(request, scopes)
+    return time.process_time() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5000)
+    args = parser.parse_args()
+
+    token, key = signed_token()
+    plain = SingleTenantAzureAuthorizationCodeBearer(
+        app_client_id=settings.APP_CLIENT_ID, tenant_id=settings.TENANT_ID
+    )
+    cached = CachedSingleTenantAzureAuthorizationCodeBearer(
+        app_client_id=settings.APP_CLIENT_ID, tenant_id=settings.TENANT_ID
+    )
+    prepare(plain, key)
+    prepare(cached, key)
+
+    uncached_seconds = asyncio.run(time_scheme(plain, token, args.rounds))
+    cached_seconds = asyncio.run(time_scheme(cached, token, args.rounds))
+    results = {
+        "rounds": args.rounds,
+        "uncached_cpu_us_per_request": round(uncached_seconds / args.rounds * 1e6, 2),
+        "cached_cpu_us_per_request": round(cached_seconds / args.rounds * 1e6, 2),
+        "saved_cpu_us_per_request": round(
+            (uncached_seconds - cached_seconds) / args.rounds * 1e6, 2
+        ),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Check how many SQL statements each write endpoint executes, by counting the
+cursor executions on the app's engine while a single request runs. Exits with
+status 1 when any write executes more statements than expected.
+
+Without --database-url the app runs against a temporary SQLite database, which
+needs `aiosqlite`. A Postgres URL must point at an empty, throwaway database.
+
+Usage:
+    python -m src.benchmarks.write_statements
+"""
+import argparse
+import asyncio
+import json
+import sys
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import httpx
+from sqlalchemy import event
+
+from src.benchmarks.harness import benchmark_app
+
+# Statements per write, transaction control (BEGIN/COMMIT) is not counted
+EXPECTED = {
+    # INSERT .. RETURNING, INSERT of the counters row
+    "create_user": 2,
+    # INSERT .. RETURNING, counters upsert
+    "create_post": 2,
+    # UPDATE .. RETURNING
+    "put_post": 1,
+    "patch_post": 1,
+    # Read of the previous flag, UPDATE .. RETURNING, counters upsert
+    "patch_post_published": 3,
+    "put_user": 1,
+    "patch_user": 1,
+    # DELETE .. RETURNING, counters upsert
+    "delete_post": 2,
+    # DELETE of the counters row, DELETE .. RETURNING
+    "delete_user": 2,
+}
+
+
+class StatementCounter:
+    def __init__(self, engine: Any) -> None:
+        self.statements: list[str] = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self.record)
+
+    def record(self, conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        self.statements.append(statement)
+
+    async def count(
+        self, request: Callable[[], Awaitable[httpx.Response]]
+    ) -> tuple[httpx.Response, list[str]]:
+        self.statements = []
+        response = await request()
+        response.raise_for_status()
+        return response, self.statements
+
+
+async def count_writes(database_url: str | None) -> dict[str, Any]:
+    async with benchmark_app(database_url) as (_, client, engine):
+        from src.app.helpers.config import settings
+
+        prefix = settings.API_PREFIX
+        counter = StatementCounter(engine)
+        results: dict[str, list[str]] = {}
+
+        response, results["create_user"] = await counter.count(
+            lambda: client.post(
+                f"{prefix}/users", json={"email": "w@example.com", "name": "Writer"}
+            )
+        )
+        user_id = response.json()["id"]
+        response, results["create_post"] = await counter.count(
+            lambda: client.post(
+                f"{prefix}/posts",
+                params={"author_id": user_id},
+                json={"title": "Draft", "content": "Counting statements"},
+            )
+        )
+        post_id = response.json()["id"]
+        _, results["put_post"] = await counter.count(
+            lambda: client.put(
+                f"{prefix}/posts/{post_id}",
+                json={"title": "Renamed", "content": "Counting statements"},
+            )
+        )
+        _, results["patch_post"] = await counter.count(
+            lambda: client.patch(f"{prefix}/posts/{post_id}", json={"title": "Again"})
+        )
+        _, results["patch_post_published"] = await counter.count(
+            lambda: client.patch(
+                f"{prefix}/posts/{post_id}", json={"published": True}
+            )
+        )
+        _, results["put_user"] = await counter.count(
+            lambda: client.put(
+                f"{prefix}/users/{user_id}",
+                json={"email": "w@example.com", "name": "Renamed"},
+            )
+        )
+        _, results["patch_user"] = await counter.count(
+            lambda: client.patch(f"{prefix}/users/{user_id}", json={"name": "Again"})
+        )
+        _, results["delete_post"] = await counter.count(
+            lambda: client.delete(f"{prefix}/posts/{post_id}")
+        )
+        _, results["delete_user"] = await counter.count(
+            lambda: client.delete(f"{prefix}/users/{user_id}")
+        )
+
+    return {
+        name: {
+            "statements": len(statements),
+            "expected": EXPECTED[name],
+            "executed": statements,
+        }
+        for name, statements in results.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    results = asyncio.run(count_writes(args.database_url))
+    print(json.dumps(results, indent=2))
+    if any(row["statements"] > row["expected"] for row in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
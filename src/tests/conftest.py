@@ -0,0 +1,8 @@
+import os
+
+from src.benchmarks.harness import PLACEHOLDER_SETTINGS
+
+# The app reads its settings on import. Tests override auth and the database,
+# so the remaining required settings only need placeholders
+for name in PLACEHOLDER_SETTINGS:
+    os.environ.setdefault(name, "test")
@@ -0,0 +1,56 @@
+import pytest
+
+from src.tests.integration.conftest import AppUnderTest
+
+
+async def create_posts(api: AppUnderTest, posts: list[dict[str, str]]) -> list[int]:
+    response = await api.client.post(
+        f"{api.prefix}/users", json={"email": "s@example.com", "name": "Searcher"}
+    )
+    author_id = response.json()["id"]
+    response = await api.client.post(
+        f"{api.prefix}/posts/bulk", params={"author_id": author_id}, json=posts
+    )
+    response.raise_for_status()
+    ids: list[int] = response.json()["ids"]
+    return ids
+
+
+async def search_pages(api: AppUnderTest, q: str, limit: int) -> list[int]:
+    ids: list[int] = []
+    params: dict[str, str | int] = {"q": q, "limit": limit}
+    # A cursor that repeats rows would otherwise page forever
+    for _ in range(100):
+        response = await api.client.get(f"{api.prefix}/posts/search", params=params)
+        response.raise_for_status()
+        page = response.json()
+        ids += [post["id"] for post in page["data"]]
+        if page["next_cursor"] is None:
+            return ids
+        params["cursor"] = page["next_cursor"]
+    raise AssertionError(f"Search for {q!r} did not finish paging: {ids}")
+
+
+@pytest.mark.asyncio
+async def test_search_pages_cover_every_match_once(api: AppUnderTest) -> None:
+    # Tied ranks, and ranks that real (float4) cannot represent exactly
+    posts = [{"title": f"Tied {i}", "content": "a needle in hay"} for i in range(5)]
+    posts += [
+        {"title": "Needle", "content": "needle " + "hay " * i + "needle"}
+        for i in range(5)
+    ]
+    posts += [{"title": "Other", "content": "nothing to find here"}]
+    ids = await create_posts(api, posts)
+
+    single_page = await search_pages(api, "needle", limit=100)
+    assert sorted(single_page) == sorted(ids[:10])
+    for limit in (1, 2, 3):
+        assert await search_pages(api, "needle", limit=limit) == single_page
+
+
+@pytest.mark.asyncio
+async def test_search_limit_is_bounded(api: AppUnderTest) -> None:
+    response = await api.client.get(
+        f"{api.prefix}/posts/search", params={"q": "needle", "limit": 101}
+    )
+    assert response.status_code == 422